@@ -2,12 +2,48 @@
 Gerenciador de projetos do HydroAI
 Cria, carrega e gerencia projetos de análise de bacias
 """
+import heapq
 import json
+import os
+import re
+import tempfile
+import time
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Acima deste número de projetos, os project.json são lidos em paralelo
+PARALLEL_LOAD_THRESHOLD = 32
+PARALLEL_LOAD_WORKERS = 8
+
+# Por quanto tempo (s) metadados em cache são usados sem novo stat do arquivo
+METADATA_CACHE_TTL = 1.0
+
+# Caracteres não permitidos em nomes de projeto (tudo exceto alfanuméricos, _ e -)
+_UNSAFE_NAME_RE = re.compile(r'[^\w\-]')
+
+
+def _dumps(data: Dict) -> bytes:
+    """Serializa metadados em JSON UTF-8 indentado (orjson se disponível)"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+def _loads(raw: bytes) -> Dict:
+    """Desserializa JSON (orjson se disponível)"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
 class ProjectManager:
     """
     Gerencia projetos de análise de bacias hidrográficas
@@ -23,6 +59,9 @@ class ProjectManager:
     └── project.json
     """
     
+    # Subdiretórios criados em todo projeto novo
+    PROJECT_SUBDIRS = ('data/raw', 'data/processed', 'results', 'reports', 'cache')
+    
     def __init__(self, base_dir: Path):
         """
         Inicializa gerenciador de projetos
@@ -36,6 +75,10 @@ class ProjectManager:
         self.base_dir.mkdir(parents=True, exist_ok=True)
         self.logger = logging.getLogger(__name__)
         
+        # Cache de metadados:
+        # caminho do project.json -> ((mtime_ns, tamanho), validado_em, bytes)
+        self._meta_cache: Dict[str, tuple] = {}
+        
         self.logger.info(f"ProjectManager inicializado em: {self.base_dir}")
         
     def create_project(
@@ -71,36 +114,34 @@ class ProjectManager:
             lon=-56.737
         )
         """
-        # Nome único com timestamp
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        # Nome único com timestamp (um único instante para nome e metadados)
+        now = datetime.now()
+        timestamp = now.strftime('%Y%m%d_%H%M%S')
+        now_iso = now.isoformat()
         safe_name = self._sanitize_name(name)
         project_name = f"{safe_name}_{timestamp}"
         project_path = self.base_dir / project_name
         
         self.logger.info(f"Criando projeto: {name}")
         
-        # Cria estrutura de diretórios
-        (project_path / 'data' / 'raw').mkdir(parents=True, exist_ok=True)
-        self.logger.info(f"  - Criado: data/raw/")
-        
-        (project_path / 'data' / 'processed').mkdir(parents=True, exist_ok=True)
-        self.logger.info(f"  - Criado: data/processed/")
-        
-        (project_path / 'results').mkdir(parents=True, exist_ok=True)
-        self.logger.info(f"  - Criado: results/")
+        # Cria estrutura de diretórios: pais uma vez, depois só as folhas
+        (project_path / 'data').mkdir(parents=True, exist_ok=True)
+        for subdir in self.PROJECT_SUBDIRS:
+            try:
+                os.mkdir(project_path / subdir)
+            except FileExistsError:
+                pass
         
-        (project_path / 'reports').mkdir(parents=True, exist_ok=True)
-        self.logger.info(f"  - Criado: reports/")
-        
-        (project_path / 'cache').mkdir(parents=True, exist_ok=True)
-        self.logger.info(f"  - Criado: cache/")
+        if self.logger.isEnabledFor(logging.INFO):
+            for subdir in self.PROJECT_SUBDIRS:
+                self.logger.info(f"  - Criado: {subdir}/")
         
         # Metadados do projeto
         metadata = {
             'name': name,
             'description': description,
-            'created_at': datetime.now().isoformat(),
-            'last_modified': datetime.now().isoformat(),
+            'created_at': now_iso,
+            'last_modified': now_iso,
             'outlet': {
                 'lat': lat,
                 'lon': lon
@@ -112,9 +153,7 @@ class ProjectManager:
         }
         
         # Salva metadados
-        metadata_file = project_path / 'project.json'
-        with open(metadata_file, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        self._write_metadata(self._metadata_file(project_path), metadata)
         
         self.logger.info(f"✓ Projeto criado em: {project_path}")
         
@@ -138,13 +177,32 @@ class ProjectManager:
         --------
         metadata = pm.load_project(Path('data/projects/meu_projeto_20251114_144530'))
         """
-        metadata_file = Path(project_path) / 'project.json'
-        
-        if not metadata_file.exists():
-            raise FileNotFoundError(f"Projeto não encontrado: {project_path}")
+        metadata_file = self._metadata_file(project_path)
         
-        with open(metadata_file, 'r', encoding='utf-8') as f:
-            metadata = json.load(f)
+        # Dentro do TTL, confia no cache sem nem consultar o disco
+        now = time.monotonic()
+        cached = self._meta_cache.get(metadata_file)
+        if cached is not None and now - cached[1] < METADATA_CACHE_TTL:
+            raw = cached[2]
+        else:
+            try:
+                st = os.stat(metadata_file)
+            except FileNotFoundError:
+                self._meta_cache.pop(metadata_file, None)
+                raise FileNotFoundError(f"Projeto não encontrado: {project_path}")
+            
+            # Reaproveita metadados já lidos se o arquivo não mudou
+            signature = (st.st_mtime_ns, st.st_size)
+            if cached is not None and cached[0] == signature:
+                raw = cached[2]
+            else:
+                with open(metadata_file, 'rb') as f:
+                    raw = f.read()
+            self._meta_cache[metadata_file] = (signature, now, raw)
+        
+        # O cache guarda os bytes: cada chamada recebe um dict novo (inclusive
+        # os aninhados), que pode ser alterado sem sujar o cache
+        metadata = _loads(raw)
         
         self.logger.info(f"✓ Projeto carregado: {metadata['name']}")
         
@@ -172,16 +230,50 @@ class ProjectManager:
         metadata.update(updates)
         metadata['last_modified'] = datetime.now().isoformat()
         
-        metadata_file = Path(project_path) / 'project.json'
-        with open(metadata_file, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        metadata_file = self._metadata_file(project_path)
+        self._write_metadata(metadata_file, metadata)
+        
+        # Escrita pode cair no mesmo tick de mtime: descarta o cache explicitamente
+        self._meta_cache.pop(metadata_file, None)
         
         self.logger.info(f"✓ Projeto atualizado")
     
-    def list_projects(self) -> List[Dict]:
+    def iter_projects(self, limit: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Itera sobre os projetos, do mais recente para o mais antigo
+        
+        A ordenação usa o mtime do project.json; o JSON só é lido
+        quando o projeto é efetivamente consumido.
+        
+        Parameters:
+        -----------
+        limit : int, optional
+            Número máximo de projetos (os mais recentes)
+            
+        Yields:
+        -------
+        dict
+            Metadados do projeto (com a chave 'path')
+            
+        Exemplo:
+        --------
+        for p in pm.iter_projects(limit=5):
+            print(p['name'])
+        """
+        for project_dir in self._ranked_project_dirs(limit):
+            metadata = self._try_load_project(project_dir)
+            if metadata is not None:
+                yield metadata
+    
+    def list_projects(self, limit: Optional[int] = None) -> List[Dict]:
         """
         Lista todos os projetos
         
+        Parameters:
+        -----------
+        limit : int, optional
+            Número máximo de projetos (os mais recentes)
+        
         Returns:
         --------
         list
@@ -193,26 +285,78 @@ class ProjectManager:
         for p in projetos:
             print(f"{p['name']} - {p['last_modified']}")
         """
-        projects = []
-        
-        for project_dir in self.base_dir.iterdir():
-            if project_dir.is_dir():
-                metadata_file = project_dir / 'project.json'
-                if metadata_file.exists():
-                    try:
-                        metadata = self.load_project(project_dir)
-                        metadata['path'] = str(project_dir)
-                        projects.append(metadata)
-                    except Exception as e:
-                        self.logger.warning(f"Erro ao carregar {project_dir}: {e}")
-        
-        # Ordena por data de modificação (mais recente primeiro)
-        projects.sort(key=lambda x: x['last_modified'], reverse=True)
+        project_dirs = self._ranked_project_dirs(limit)
+        
+        # Muitos projetos: sobrepõe as leituras de disco em threads
+        if len(project_dirs) > PARALLEL_LOAD_THRESHOLD:
+            with ThreadPoolExecutor(max_workers=PARALLEL_LOAD_WORKERS) as executor:
+                loaded = list(executor.map(self._try_load_project, project_dirs))
+        else:
+            loaded = [self._try_load_project(d) for d in project_dirs]
+        
+        projects = [metadata for metadata in loaded if metadata is not None]
         
         self.logger.info(f"Total de projetos encontrados: {len(projects)}")
         
         return projects
     
+    def _ranked_project_dirs(self, limit: Optional[int] = None) -> List[str]:
+        """
+        Lista diretórios de projeto ordenados por modificação (mais recente primeiro)
+        
+        Apenas faz stat do project.json, sem ler o JSON.
+        
+        Parameters:
+        -----------
+        limit : int, optional
+            Mantém apenas os N mais recentes
+            
+        Returns:
+        --------
+        list
+            Caminhos (str) dos diretórios de projeto
+        """
+        candidates = []
+        
+        # scandir usa o d_type do readdir: is_dir() não precisa de stat extra
+        with os.scandir(self.base_dir) as it:
+            for entry in it:
+                if not entry.is_dir():
+                    continue
+                try:
+                    mtime = os.stat(os.path.join(entry.path, 'project.json')).st_mtime
+                except OSError:
+                    continue
+                candidates.append((mtime, entry.path))
+        
+        if limit is not None:
+            candidates = heapq.nlargest(limit, candidates)
+        else:
+            candidates.sort(reverse=True)
+        
+        return [path for _, path in candidates]
+    
+    def _try_load_project(self, project_dir: str) -> Optional[Dict]:
+        """
+        Carrega metadados para listagem, sem propagar erros
+        
+        Returns:
+        --------
+        dict ou None
+            Metadados com a chave 'path', ou None se o diretório
+            não for um projeto válido
+        """
+        try:
+            metadata = self.load_project(project_dir)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.warning(f"Erro ao carregar {project_dir}: {e}")
+            return None
+        
+        metadata['path'] = project_dir
+        return metadata
+    
     def delete_project(self, project_path: Path):
         """
         Remove projeto
@@ -232,6 +376,7 @@ class ProjectManager:
         
         if project_path.exists():
             shutil.rmtree(project_path)
+            self._meta_cache.pop(self._metadata_file(project_path), None)
             self.logger.info(f"✓ Projeto removido: {project_path}")
         else:
             raise FileNotFoundError(f"Projeto não encontrado: {project_path}")
@@ -250,16 +395,81 @@ class ProjectManager:
         float
             Tamanho em MB
         """
-        project_path = Path(project_path)
-        
         total_size = 0
-        for path in project_path.rglob('*'):
-            if path.is_file():
-                total_size += path.stat().st_size
+        for size in self._scandir_recursive(project_path):
+            total_size += size
         
         size_mb = total_size / (1024 * 1024)
         return size_mb
     
+    def _scandir_recursive(self, path) -> Iterator[int]:
+        """
+        Percorre diretório recursivamente com os.scandir
+        
+        Usa o stat em cache do DirEntry (vindo do readdir), evitando um
+        stat() extra e a criação de um objeto Path por arquivo.
+        A pilha explícita evita cadeias de geradores aninhados e o limite
+        de recursão em árvores profundas. Links simbólicos são ignorados.
+        
+        Parameters:
+        -----------
+        path : Path ou str
+            Diretório a percorrer
+            
+        Yields:
+        -------
+        int
+            Tamanho em bytes de cada arquivo encontrado
+        """
+        stack = [path]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_symlink():
+                                continue
+                            if entry.is_file(follow_symlinks=False):
+                                yield entry.stat(follow_symlinks=False).st_size
+                            elif entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                        except OSError:
+                            # Arquivo removido durante a varredura
+                            continue
+            except OSError:
+                # Sem permissão, inexistente ou não é diretório: conta como 0 bytes
+                pass
+    
+    def _metadata_file(self, project_path) -> str:
+        """Caminho (str) do project.json, usado também como chave do cache"""
+        return os.path.join(project_path, 'project.json')
+    
+    def _write_metadata(self, metadata_file: str, metadata: Dict):
+        """
+        Grava project.json de forma atômica
+        
+        Escreve num arquivo temporário de nome único ao lado e troca com
+        os.replace, assim leitores nunca veem um JSON truncado pela metade,
+        mesmo com vários processos gravando o mesmo projeto.
+        
+        Parameters:
+        -----------
+        metadata_file : str
+            Caminho do project.json
+        metadata : dict
+            Metadados a gravar
+        """
+        fd, tmp_file = tempfile.mkstemp(
+            prefix='project.json.', suffix='.tmp', dir=os.path.dirname(metadata_file)
+        )
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_dumps(metadata))
+            os.replace(tmp_file, metadata_file)
+        except BaseException:
+            os.unlink(tmp_file)
+            raise
+    
     def _sanitize_name(self, name: str) -> str:
         """
         Remove caracteres inválidos do nome do projeto
@@ -274,10 +484,8 @@ class ProjectManager:
         str
             Nome sanitizado (seguro para usar como nome de diretório)
         """
-        import re
-        
         # Remove caracteres especiais, mantém apenas alfanuméricos, _ e -
-        safe_name = re.sub(r'[^\w\-]', '_', name)
+        safe_name = _UNSAFE_NAME_RE.sub('_', name)
         
         # Limita tamanho
         return safe_name[:50]
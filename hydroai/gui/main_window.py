@@ -6,16 +6,18 @@ from PyQt5.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QTabWidget,
     QPushButton, QLabel, QLineEdit, QComboBox, QSpinBox, QDoubleSpinBox,
     QFileDialog, QMessageBox, QProgressBar, QTextEdit, QGroupBox,
-    QGridLayout, QTableWidget, QTableWidgetItem, QHeaderView
+    QGridLayout, QTableWidget, QTableWidgetItem, QHeaderView, QDialog
 )
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
 from PyQt5.QtGui import QFont, QIcon, QColor
 from pathlib import Path
 import logging
 
+from hydroai.core.project_manager import ProjectManager
 from hydroai.gui.map_widget import MapWidget
 from hydroai.gui.watershed_tab import WatershedTab
 from hydroai.gui.analysis_tab import AnalysisTab
+from hydroai.watershed.dem_downloader import DATASETS, DEMDownloader
 
 class MainWindow(QMainWindow):
     """
@@ -29,12 +31,19 @@ class MainWindow(QMainWindow):
     - Status bar com progresso
     """
     
+    # Datasets OpenTopography, na mesma ordem do combo do diálogo de download
+    _DATASETS = tuple(DATASETS)
+    
     def __init__(self):
         super().__init__()
         
         self.logger = logging.getLogger(__name__)
         self.current_project = None
         self.watershed_gdf = None
+        self._dem_downloader = None
+        
+        # Um único gerenciador: compartilha o cache de metadados entre ações
+        self.project_manager = ProjectManager(Path('data/projects'))
         
         # Configuração da janela
         self.setWindowTitle("HydroAI - Sistema de Análise de Bacias Hidrográficas")
@@ -282,14 +291,11 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Aviso", "Digite um nome para o projeto")
             return
         
-        from hydroai.core.project_manager import ProjectManager
-        
         try:
-            pm = ProjectManager(Path('data/projects'))
             lat = self.lat_input.value()
             lon = self.lon_input.value()
             
-            self.current_project = pm.create_project(name, lat, lon)
+            self.current_project = self.project_manager.create_project(name, lat, lon)
             
             self._log(f"✓ Projeto criado: {name}")
             self._log(f"  Local: {self.current_project}")
@@ -305,15 +311,8 @@ class MainWindow(QMainWindow):
         self.map_widget.set_center(lat, lon)
         self._log(f"Mapa movido para: ({lat}, {lon})")
     
-    def download_dem(self):
-        """Baixa DEM automaticamente"""
-        from hydroai.watershed.downloader import DEMDownloader
-        
     def download_dem(self):
         """Baixa DEM com suporte a OpenTopography"""
-        from hydroai.watershed.dem_downloader import DEMDownloader
-        from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QPushButton, QComboBox, QSpinBox, QHBoxLayout
-        
         # Dialog para configurar download
         dialog = QDialog(self)
         dialog.setWindowTitle("Configurar Download de DEM")
@@ -332,7 +331,10 @@ class MainWindow(QMainWindow):
         # Dataset
         layout.addWidget(QLabel("Dataset:"))
         combo_dataset = QComboBox()
-        combo_dataset.addItems(['SRTMGL1 (30m) ⭐', 'SRTMGL3 (90m)', 'ASTER (30m)', 'ALOS (30m)'])
+        combo_dataset.addItems([
+            f"{key} ({DATASETS[key]['resolution']}m)" + (' ⭐' if DATASETS[key].get('recommended') else '')
+            for key in self._DATASETS
+        ])
         layout.addWidget(combo_dataset)
         
         # Buffer
@@ -355,8 +357,7 @@ class MainWindow(QMainWindow):
         
         # Botão de download
         def do_download():
-            datasets = ['SRTMGL1', 'SRTMGL3', 'ASTER', 'AW3D30']
-            dataset = datasets[combo_dataset.currentIndex()]
+            dataset = self._DATASETS[combo_dataset.currentIndex()]
             buffer_km = spin_buffer.value()
             
             lat = self.lat_input.value()
@@ -370,10 +371,12 @@ class MainWindow(QMainWindow):
             self.progress_bar.setValue(25)
             
             try:
-                downloader = DEMDownloader()
+                # Reaproveita o downloader (e sua sessão HTTP) entre cliques
+                if self._dem_downloader is None:
+                    self._dem_downloader = DEMDownloader()
                 
                 self._log(f"Conectando ao servidor...")
-                dem_path = downloader.download_dem(
+                dem_path = self._dem_downloader.download_dem(
                     lat, lon, output_dir,
                     buffer_km=buffer_km,
                     dataset=dataset
@@ -384,7 +387,6 @@ class MainWindow(QMainWindow):
                 self.current_dem_path = dem_path
                 self.progress_bar.setValue(100)
                 
-                from PyQt5.QtWidgets import QMessageBox
                 QMessageBox.information(
                     self, 
                     "✓ Sucesso", 
@@ -396,7 +398,6 @@ class MainWindow(QMainWindow):
             except Exception as e:
                 self._log(f"❌ Erro: {str(e)}")
                 self.progress_bar.setValue(0)
-                from PyQt5.QtWidgets import QMessageBox
                 QMessageBox.critical(self, "❌ Erro", f"Erro ao baixar:\n{e}")
         
         btn_download = QPushButton("⬇️ Baixar Agora")
@@ -462,8 +463,8 @@ class MainWindow(QMainWindow):
     
     def _log(self, message: str):
         """Adiciona mensagem ao log"""
-        current_text = self.info_text.toPlainText()
-        self.info_text.setText(f"{current_text}\n{message}")
+        # append insere um bloco sem copiar/re-renderizar o texto existente
+        self.info_text.append(message)
         # Scroll para o final
         self.info_text.verticalScrollBar().setValue(
             self.info_text.verticalScrollBar().maximum()
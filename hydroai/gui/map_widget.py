@@ -1,12 +1,19 @@
 """
 Widget de mapa interativo com Folium
 """
-from PyQt5.QtWidgets import QWidget, QVBoxLayout
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QStackedWidget, QLabel
+from PyQt5.QtCore import Qt, QTimer, QUrl
 from PyQt5.QtWebEngineWidgets import QWebEngineView
 import folium
 from folium.plugins import MousePosition, MeasureControl
-from io import BytesIO
-import base64
+from pathlib import Path
+import json
+import tempfile
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 class MapWidget(QWidget):
     """
@@ -30,35 +37,124 @@ class MapWidget(QWidget):
         MousePosition().add_to(self.m)
         MeasureControl(primary_length_unit='kilometers').add_to(self.m)
         
-        # WebView
+        # HTML do mapa vai para arquivo local (sem limite de 2 MB do setHtml)
+        self._map_dir = tempfile.TemporaryDirectory(prefix='hydroai_map_')
+        self._map_file = None
+        
+        # O WebView (Chromium) só é criado depois que a janela é pintada:
+        # até lá o QStackedWidget mostra um aviso no lugar do mapa
+        self.view = None
+        self.stack = QStackedWidget()
+        placeholder = QLabel("Carregando mapa...")
+        placeholder.setAlignment(Qt.AlignCenter)
+        self.stack.addWidget(placeholder)
+        self.layout.addWidget(self.stack)
+        
+        # Camadas dinâmicas (marcadores, polígonos) como JavaScript pronto,
+        # serializado uma única vez e reaplicado após cada renderização
+        self._layers = []
+        
+        # Operações JavaScript pendentes, enviadas em lote a cada ~1 frame
+        self._page_ready = False
+        self._pending_ops = []
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(16)
+        self._flush_timer.timeout.connect(self._flush_ops)
+    
+    def showEvent(self, event):
+        """Agenda a criação do WebView para depois da primeira pintura"""
+        super().showEvent(event)
+        if self.view is None:
+            # singleShot(0): roda no laço de eventos, após a janela aparecer
+            QTimer.singleShot(0, self._create_view)
+    
+    def _create_view(self):
+        """Cria o WebView, troca o aviso pelo mapa e renderiza"""
+        if self.view is not None:
+            return
+        
         self.view = QWebEngineView()
-        self.layout.addWidget(self.view)
+        self.view.loadFinished.connect(self._on_load_finished)
+        self.stack.addWidget(self.view)
+        self.stack.setCurrentWidget(self.view)
         
-        # Renderiza mapa
+        # Renderiza mapa (uma única vez; atualizações seguem via JavaScript)
         self._render_map()
     
     def _render_map(self):
         """Renderiza mapa no navegador"""
-        # Converte para HTML
-        data = BytesIO()
-        self.m.save(data, close_file=False)
+        if self.view is None:
+            # WebView ainda não criado: tudo é aplicado em _create_view
+            return
         
-        # Encode para Base64
-        html_string = data.getvalue().decode('utf-8')
+        self._page_ready = False
+        # A página nova traz só o mapa base: reaplica as camadas ao carregar
+        self._pending_ops[:] = self._layers
         
-        self.view.setHtml(html_string)
+        if self._map_file is None:
+            self._map_file = Path(self._map_dir.name) / 'map.html'
+            self.m.save(str(self._map_file))
+            self.view.setUrl(QUrl.fromLocalFile(str(self._map_file)))
+        else:
+            # Reconstrução completa: regrava o arquivo e recarrega a página
+            self.m.save(str(self._map_file))
+            self.view.reload()
+    
+    def _on_load_finished(self, ok):
+        """Envia operações enfileiradas enquanto a página carregava"""
+        self._page_ready = ok
+        if ok:
+            self._flush_ops()
+    
+    def _run_js(self, script: str):
+        """Enfileira JavaScript para a página do mapa"""
+        self._pending_ops.append(script)
+        if self._page_ready and not self._flush_timer.isActive():
+            self._flush_timer.start()
+    
+    def _flush_ops(self):
+        """Executa todas as operações pendentes em uma única chamada"""
+        if not self._page_ready or not self._pending_ops:
+            return
+        script = "\n".join(self._pending_ops)
+        self._pending_ops.clear()
+        self.view.page().runJavaScript(script)
     
     def set_center(self, lat, lon):
         """Centraliza mapa em coordenadas"""
         self.m.location = [lat, lon]
-        self._render_map()
+        self._run_js(f"{self.m.get_name()}.setView([{lat}, {lon}]);")
     
     def add_point(self, lat, lon, popup="Ponto"):
         """Adiciona ponto ao mapa"""
-        folium.Marker([lat, lon], popup=popup).add_to(self.m)
-        self._render_map()
+        self._add_layer(
+            f"L.marker([{lat}, {lon}]).bindPopup({json.dumps(popup)})"
+            f".addTo({self.m.get_name()});"
+        )
     
     def add_polygon(self, geojson, name="Polígono"):
-        """Adiciona polígono ao mapa"""
-        folium.GeoJson(geojson, name=name).add_to(self.m)
-        self._render_map()
+        """
+        Adiciona polígono ao mapa
+        
+        geojson pode ser um dict ou uma string GeoJSON já serializada;
+        a serialização acontece uma única vez, fora do Folium.
+        """
+        if not isinstance(geojson, str):
+            geojson = self._to_json(geojson)
+        self._add_layer(
+            f"L.geoJSON({geojson}).bindTooltip({json.dumps(name)})"
+            f".addTo({self.m.get_name()});"
+        )
+    
+    def _add_layer(self, script: str):
+        """Registra camada dinâmica e a envia para a página"""
+        self._layers.append(script)
+        self._run_js(script)
+    
+    @staticmethod
+    def _to_json(data) -> str:
+        """Serializa para JSON (orjson se disponível)"""
+        if orjson is not None:
+            return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+        return json.dumps(data)
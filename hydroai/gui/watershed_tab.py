@@ -3,37 +3,45 @@ Aba para delimitação de bacia hidrográfica
 """
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
-    QMessageBox, QProgressBar, QComboBox
+    QMessageBox, QProgressBar, QComboBox, QTableWidgetItem
 )
-from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
 from pathlib import Path
 import logging
-from hydroai.watershed import WatershedDelineator
 
-class WatershedWorker(QThread):
-    """Thread para executar delimitação sem travar GUI"""
+logger = logging.getLogger(__name__)
+
+class WatershedSignals(QObject):
+    """Sinais do WatershedWorker (QRunnable não é QObject)"""
     
     progress = pyqtSignal(int)
     finished = pyqtSignal(object)
     error = pyqtSignal(str)
+
+class WatershedWorker(QRunnable):
+    """Tarefa de delimitação executada no QThreadPool, sem travar GUI"""
     
     def __init__(self, dem_path, lat, lon):
         super().__init__()
+        self.signals = WatershedSignals()
         self.dem_path = dem_path
         self.lat = lat
         self.lon = lon
-        self.logger = logging.getLogger(__name__)
+        self.logger = logger
     
     def run(self):
         try:
-            self.progress.emit(25)
+            # Import tardio: pysheds/geopandas só carregam na primeira delimitação
+            from hydroai.watershed import WatershedDelineator
+            
+            self.signals.progress.emit(25)
             self.logger.info(f"Iniciando delimitação...")
             self.logger.info(f"  DEM: {self.dem_path}")
             self.logger.info(f"  Coordenadas: ({self.lat}, {self.lon})")
             
             delineator = WatershedDelineator()
             
-            self.progress.emit(50)
+            self.signals.progress.emit(50)
             self.logger.info("Carregando DEM...")
             
             watershed_gdf = delineator.delineate(
@@ -42,19 +50,19 @@ class WatershedWorker(QThread):
                 output_dir=Path('results/bacia')
             )
             
-            self.progress.emit(75)
+            self.signals.progress.emit(75)
             self.logger.info("Calculando estatísticas...")
             
             stats = delineator.get_stats(watershed_gdf)
             
-            self.progress.emit(100)
+            self.signals.progress.emit(100)
             self.logger.info(f"✓ Bacia delimitada! Área: {stats['area_km2']:.2f} km²")
             
-            self.finished.emit((watershed_gdf, stats))
+            self.signals.finished.emit((watershed_gdf, stats))
             
         except Exception as e:
             self.logger.error(f"Erro: {str(e)}")
-            self.error.emit(str(e))
+            self.signals.error.emit(str(e))
 
 class WatershedTab(QWidget):
     """
@@ -66,7 +74,7 @@ class WatershedTab(QWidget):
         self.parent_window = parent
         self.dem_path = None
         self.worker = None
-        self.logger = logging.getLogger(__name__)
+        self.logger = logger
         
         layout = QVBoxLayout()
         self.setLayout(layout)
@@ -137,12 +145,12 @@ class WatershedTab(QWidget):
         self._log(f"Iniciando delimitação...")
         self._log(f"Coordenadas: ({lat}, {lon})")
         
-        # Thread worker
+        # Tarefa no pool global de threads (reaproveita threads, limita concorrência)
         self.worker = WatershedWorker(dem_path, lat, lon)
-        self.worker.progress.connect(self._on_progress)
-        self.worker.finished.connect(self._on_finished)
-        self.worker.error.connect(self._on_error)
-        self.worker.start()
+        self.worker.signals.progress.connect(self._on_progress)
+        self.worker.signals.finished.connect(self._on_finished)
+        self.worker.signals.error.connect(self._on_error)
+        QThreadPool.globalInstance().start(self.worker)
     
     def _on_progress(self, value):
         self.progress.setValue(value)
@@ -157,28 +165,40 @@ class WatershedTab(QWidget):
         self._log(f"  Perímetro: {stats['perimeter_km']:.2f} km")
         self._log(f"  CRS: {stats['crs']}")
         
-        # Atualiza tabela de estatísticas
-        self.parent_window.stats_table.setRowCount(4)
-        self.parent_window.stats_table.setItem(0, 0, 
-            self.parent_window.QTableWidgetItem("Área (km²)"))
-        self.parent_window.stats_table.setItem(0, 1,
-            self.parent_window.QTableWidgetItem(f"{stats['area_km2']:.2f}"))
-        self.parent_window.stats_table.setItem(1, 0,
-            self.parent_window.QTableWidgetItem("Área (ha)"))
-        self.parent_window.stats_table.setItem(1, 1,
-            self.parent_window.QTableWidgetItem(f"{stats['area_ha']:.2f}"))
-        self.parent_window.stats_table.setItem(2, 0,
-            self.parent_window.QTableWidgetItem("Perímetro (km)"))
-        self.parent_window.stats_table.setItem(2, 1,
-            self.parent_window.QTableWidgetItem(f"{stats['perimeter_km']:.2f}"))
-        self.parent_window.stats_table.setItem(3, 0,
-            self.parent_window.QTableWidgetItem("CRS"))
-        self.parent_window.stats_table.setItem(3, 1,
-            self.parent_window.QTableWidgetItem(str(stats['crs'])))
+        # Atualiza tabela de estatísticas (um único repaint ao final)
+        rows = [
+            ("Área (km²)", f"{stats['area_km2']:.2f}"),
+            ("Área (ha)", f"{stats['area_ha']:.2f}"),
+            ("Perímetro (km)", f"{stats['perimeter_km']:.2f}"),
+            ("CRS", str(stats['crs'])),
+        ]
+        
+        table = self.parent_window.stats_table
+        table.setUpdatesEnabled(False)
+        table.blockSignals(True)
+        try:
+            if table.rowCount() != len(rows):
+                table.setRowCount(len(rows))
+            for row, texts in enumerate(rows):
+                for col, text in enumerate(texts):
+                    # Reaproveita itens existentes; só aloca na primeira vez
+                    item = table.item(row, col)
+                    if item is None:
+                        table.setItem(row, col, QTableWidgetItem(text))
+                    else:
+                        item.setText(text)
+        finally:
+            table.blockSignals(False)
+            table.setUpdatesEnabled(True)
+            table.viewport().update()
         
         # Adiciona ao mapa
         try:
-            geojson = watershed_gdf.__geo_interface__
+            import shapely
+            
+            # GeoJSON serializado em C pelo GEOS, passado como string ao mapa
+            geom = shapely.union_all(watershed_gdf.geometry.values)
+            geojson = shapely.to_geojson(geom)
             self.parent_window.map_widget.add_polygon(geojson, "Bacia Delimitada")
             self._log("✓ Bacia adicionada ao mapa")
         except Exception as e:
@@ -190,8 +210,8 @@ class WatershedTab(QWidget):
     
     def _log(self, message: str):
         """Adiciona mensagem ao log"""
-        current_text = self.log_text.toPlainText()
-        self.log_text.setText(f"{current_text}\n{message}")
+        # append insere um bloco sem copiar/re-renderizar o texto existente
+        self.log_text.append(message)
         # Scroll para o final
         self.log_text.verticalScrollBar().setValue(
             self.log_text.verticalScrollBar().maximum()
@@ -2,8 +2,12 @@
 Funções de formatação de dados
 """
 from datetime import datetime
+from functools import lru_cache
 from typing import Union
 
+# Troca separadores do formato en-US para pt-BR ("," <-> ".") em uma passada
+_PT_BR_SEPARATORS = str.maketrans({',': '.', '.': ','})
+
 def format_area(area_m2: float, unit: str = 'auto') -> str:
     """
     Formata área para exibição
@@ -41,6 +45,16 @@ def format_area(area_m2: float, unit: str = 'auto') -> str:
     else:
         return f"{area_m2:.2f} m²"
 
+@lru_cache(maxsize=1024)
+def _parse_iso(date_str: str) -> datetime:
+    """Converte string ISO em datetime (memoizado por string)"""
+    return datetime.fromisoformat(date_str)
+
+@lru_cache(maxsize=4096)
+def _format_iso(date_str: str, format_str: str) -> str:
+    """Formata string ISO (memoizado por par string/formato)"""
+    return _parse_iso(date_str).strftime(format_str)
+
 def format_date(date: Union[str, datetime], format_str: str = '%d/%m/%Y') -> str:
     """
     Formata data para exibição
@@ -62,10 +76,12 @@ def format_date(date: Union[str, datetime], format_str: str = '%d/%m/%Y') -> str
     format_date('2025-11-14')  # → "14/11/2025"
     """
     if isinstance(date, str):
+        # Só a conversão da string é tolerada; erro no formato se propaga
         try:
-            date = datetime.fromisoformat(date)
-        except:
+            _parse_iso(date)
+        except ValueError:
             return date
+        return _format_iso(date, format_str)
     
     return date.strftime(format_str)
 
@@ -90,4 +106,4 @@ def format_number(number: float, decimals: int = 2) -> str:
     format_number(1234567.89)  # → "1.234.567,89"
     """
     # Formata com separadores (locale-aware)
-    return f"{number:,.{decimals}f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+    return f"{number:,.{decimals}f}".translate(_PT_BR_SEPARATORS)
@@ -1,11 +1,21 @@
 """
 Módulo de delimitação de bacias hidrográficas com PySheds
-"""
 
-from hydroai.watershed.delineator import WatershedDelineator
-from hydroai.watershed.pysheds_wrapper import PySheksWrapper
+As classes são importadas sob demanda (PEP 562): importar o pacote não
+carrega pysheds/geopandas/rasterio até o primeiro acesso.
+"""
 
 __all__ = [
     'WatershedDelineator',
     'PySheksWrapper',
 ]
+
+
+def __getattr__(name):
+    if name == 'WatershedDelineator':
+        from hydroai.watershed.delineator import WatershedDelineator
+        return WatershedDelineator
+    if name == 'PySheksWrapper':
+        from hydroai.watershed.pysheds_wrapper import PySheksWrapper
+        return PySheksWrapper
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
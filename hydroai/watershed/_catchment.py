@@ -0,0 +1,62 @@
+"""
+Delimitação de bacia (D8 reverso) compilada com Numba
+Percorre, a partir do exutório, todas as células que drenam para ele
+"""
+import numpy as np
+from numba import njit
+
+from hydroai.watershed._d8 import D8_ROWS, D8_COLS, D8_INFLOW
+
+def catchment_mask(fdir: np.ndarray, row: int, col: int) -> np.ndarray:
+    """
+    Máscara da bacia que drena para (row, col)
+
+    Parameters:
+    -----------
+    fdir : ndarray
+        Direção de fluxo D8 (uint8, códigos do PySheds)
+    row, col : int
+        Índices do exutório na grid
+
+    Returns:
+    --------
+    ndarray
+        Máscara booleana com o formato de fdir
+    """
+    rows, cols = fdir.shape
+    if not (0 <= row < rows and 0 <= col < cols):
+        raise ValueError(f"Exutório fora da grid: row={row}, col={col}, grid {rows}x{cols}")
+
+    fdir = np.ascontiguousarray(fdir, dtype=np.uint8)
+
+    return _catchment(fdir, row, col)
+
+@njit(cache=True, nogil=True)
+def _catchment(fdir, row, col):
+    rows, cols = fdir.shape
+    catch = np.zeros((rows, cols), np.bool_)
+
+    # Pilha de índices planos; cada célula entra uma única vez
+    stack = np.empty(rows * cols, np.int64)
+    stack[0] = row * cols + col
+    top = 1
+    catch[row, col] = True
+
+    while top > 0:
+        top -= 1
+        cell = stack[top]
+        r = cell // cols
+        c = cell % cols
+
+        for k in range(8):
+            rn = r + D8_ROWS[k]
+            cn = c + D8_COLS[k]
+            if rn < 0 or cn < 0 or rn >= rows or cn >= cols or catch[rn, cn]:
+                continue
+
+            if fdir[rn, cn] == D8_INFLOW[k]:
+                catch[rn, cn] = True
+                stack[top] = rn * cols + cn
+                top += 1
+
+    return catch
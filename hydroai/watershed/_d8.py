@@ -0,0 +1,12 @@
+"""
+Tabelas D8 compartilhadas pelos kernels Numba (_flood, _catchment)
+"""
+import numpy as np
+
+# Vizinhança D8 (linha, coluna)
+D8_ROWS = np.array([-1, -1, -1, 0, 0, 1, 1, 1])
+D8_COLS = np.array([-1, 0, 1, -1, 1, -1, 0, 1])
+
+# Código que cada vizinho precisa ter para drenar para a célula central
+# (dirmap padrão do PySheds: N=64, NE=128, E=1, SE=2, S=4, SW=8, W=16, NW=32)
+D8_INFLOW = np.array([2, 4, 8, 1, 16, 128, 64, 32], dtype=np.uint8)
@@ -0,0 +1,147 @@
+"""
+Priority-Flood+Epsilon (Barnes et al., 2014) compilado com Numba
+Preenche poços e depressões e resolve áreas planas em uma única passada
+"""
+import numpy as np
+from numba import njit
+
+from hydroai.watershed._d8 import D8_ROWS, D8_COLS
+
+def priority_flood_fill(dem: np.ndarray, nodata=None) -> np.ndarray:
+    """
+    Condiciona o DEM para roteamento D8
+
+    Equivale a fill_pits + fill_depressions + resolve_flats: cada célula
+    sem saída é elevada até o ponto de transbordo mais um incremento
+    mínimo (nextafter), de modo que toda célula drena para a borda.
+
+    Parameters:
+    -----------
+    dem : ndarray
+        Elevações (2D). Inteiros são convertidos para float32.
+    nodata : float, optional
+        Valor sem dado (NaN também é tratado como sem dado)
+
+    Returns:
+    --------
+    ndarray
+        Novo array com o DEM condicionado (o original não é alterado)
+    """
+    if not np.issubdtype(dem.dtype, np.floating):
+        dem = dem.astype(np.float32)
+
+    dem = np.ascontiguousarray(dem)
+    dtype = dem.dtype.type
+    nodata = dtype(np.nan if nodata is None else nodata)
+
+    return _priority_flood(dem, nodata, dtype(np.inf))
+
+@njit(cache=True)
+def _priority_flood(dem, nodata, inf):
+    rows, cols = dem.shape
+    out = dem.copy()
+
+    invalid = np.empty((rows, cols), np.bool_)
+    for r in range(rows):
+        for c in range(cols):
+            z = out[r, c]
+            invalid[r, c] = z != z or z == nodata
+
+    closed = invalid.copy()
+
+    # Heap binário (fila de prioridade) e fila FIFO de células em poços;
+    # cada célula entra uma única vez, então n posições bastam
+    n = rows * cols
+    heap_z = np.empty(n, out.dtype)
+    heap_i = np.empty(n, np.int64)
+    size = 0
+    pit = np.empty(n, np.int64)
+    head = 0
+    tail = 0
+
+    # Sementes: células válidas na borda ou vizinhas de nodata
+    for r in range(rows):
+        for c in range(cols):
+            if invalid[r, c]:
+                continue
+
+            edge = r == 0 or c == 0 or r == rows - 1 or c == cols - 1
+            if not edge:
+                for k in range(8):
+                    if invalid[r + D8_ROWS[k], c + D8_COLS[k]]:
+                        edge = True
+                        break
+
+            if edge:
+                closed[r, c] = True
+                size = _heap_push(heap_z, heap_i, size, out[r, c], r * cols + c)
+
+    while head < tail or size > 0:
+        if head < tail:
+            cell = pit[head]
+            head += 1
+        else:
+            cell = heap_i[0]
+            size = _heap_pop(heap_z, heap_i, size)
+
+        r = cell // cols
+        c = cell % cols
+        spill = np.nextafter(out[r, c], inf)
+
+        for k in range(8):
+            rn = r + D8_ROWS[k]
+            cn = c + D8_COLS[k]
+            if rn < 0 or cn < 0 or rn >= rows or cn >= cols or closed[rn, cn]:
+                continue
+
+            closed[rn, cn] = True
+
+            if out[rn, cn] <= spill:
+                # Dentro de poço ou área plana: eleva e processa em seguida
+                out[rn, cn] = spill
+                pit[tail] = rn * cols + cn
+                tail += 1
+            else:
+                size = _heap_push(heap_z, heap_i, size, out[rn, cn], rn * cols + cn)
+
+    return out
+
+@njit(cache=True)
+def _heap_push(heap_z, heap_i, size, z, i):
+    pos = size
+    while pos > 0:
+        parent = (pos - 1) >> 1
+        if heap_z[parent] <= z:
+            break
+        heap_z[pos] = heap_z[parent]
+        heap_i[pos] = heap_i[parent]
+        pos = parent
+
+    heap_z[pos] = z
+    heap_i[pos] = i
+
+    return size + 1
+
+@njit(cache=True)
+def _heap_pop(heap_z, heap_i, size):
+    size -= 1
+    z = heap_z[size]
+    i = heap_i[size]
+
+    pos = 0
+    while True:
+        child = 2 * pos + 1
+        if child >= size:
+            break
+        if child + 1 < size and heap_z[child + 1] < heap_z[child]:
+            child += 1
+        if z <= heap_z[child]:
+            break
+        heap_z[pos] = heap_z[child]
+        heap_i[pos] = heap_i[child]
+        pos = child
+
+    heap_z[pos] = z
+    heap_i[pos] = i
+
+    return size
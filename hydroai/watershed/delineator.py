@@ -3,12 +3,14 @@ Interface principal para delimitação de bacias
 Usa PySheds internamente
 """
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Sequence
 import logging
 import geopandas as gpd
 
 from hydroai.watershed.pysheds_wrapper import PySheksWrapper
 
+logger = logging.getLogger(__name__)
+
 class WatershedDelineator:
     """
     Delimitador de bacias hidrográficas usando PySheds
@@ -22,7 +24,7 @@ class WatershedDelineator:
     
     def __init__(self):
         """Inicializa delimitador"""
-        self.logger = logging.getLogger(__name__)
+        self.logger = logger
         self.pysheds = PySheksWrapper()
     
     def delineate(
@@ -30,7 +32,8 @@ class WatershedDelineator:
         lat: float,
         lon: float,
         dem_path: Path,
-        output_dir: Optional[Path] = None
+        output_dir: Optional[Path] = None,
+        output_formats: Sequence[str] = ('gpkg',)
     ) -> gpd.GeoDataFrame:
         """
         Delimita bacia hidrográfica
@@ -47,6 +50,8 @@ class WatershedDelineator:
             - GEBCO: https://www.gebco.net
         output_dir : Path, optional
             Diretório para salvar resultados
+        output_formats : sequence of str
+            Formatos gravados em output_dir: 'gpkg', 'geojson', 'shp'
             
         Returns:
         --------
@@ -58,7 +63,8 @@ class WatershedDelineator:
                 lat=lat,
                 lon=lon,
                 dem_path=dem_path,
-                output_path=output_dir
+                output_path=output_dir,
+                output_formats=output_formats
             )
             
             return watershed_gdf
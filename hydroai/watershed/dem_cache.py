@@ -0,0 +1,78 @@
+"""
+Cache local de DEMs baixados
+Compartilhado pelos downloaders (OpenTopography, USGS, Google Cloud)
+"""
+from pathlib import Path
+from typing import Optional
+import logging
+import os
+import shutil
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# Diretório do cache (sobrescrevível via HYDROAI_CACHE)
+DEM_CACHE_DIR = Path(os.environ.get('HYDROAI_CACHE', Path.home() / '.cache' / 'hydroai' / 'dem'))
+
+def load_from_cache(name: str, output_file: Path) -> Optional[Path]:
+    """
+    Copia um DEM do cache para o destino, se existir
+    
+    Parameters:
+    -----------
+    name : str
+        Nome do arquivo no cache (a chave)
+    output_file : Path
+        Onde o DEM deve ficar
+        
+    Returns:
+    --------
+    Path ou None
+        output_file se houve acerto no cache, None caso contrário
+    """
+    cached_file = DEM_CACHE_DIR / name
+    
+    try:
+        if cached_file.stat().st_size == 0:
+            return None
+    except FileNotFoundError:
+        return None
+    
+    shutil.copy2(cached_file, output_file)
+    logger.info(f"✓ DEM encontrado no cache local: {cached_file}")
+    
+    return Path(output_file)
+
+def store_in_cache(source: Path, name: str):
+    """
+    Copia arquivo baixado para o cache local
+    
+    A cópia vai para um temporário de nome único e é renomeada
+    (os.replace), então o cache nunca contém arquivos parciais, mesmo
+    com vários processos gravando a mesma chave. Falhas apenas geram aviso.
+    
+    Parameters:
+    -----------
+    source : Path
+        Arquivo baixado
+    name : str
+        Nome do arquivo no cache (a chave)
+    """
+    cached_file = DEM_CACHE_DIR / name
+    
+    tmp_file = None
+    try:
+        cached_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(
+            prefix=cached_file.name + '.', suffix='.tmp', dir=cached_file.parent
+        )
+        os.close(fd)
+        shutil.copy2(source, tmp_file)
+        os.replace(tmp_file, cached_file)
+    except OSError as e:
+        logger.warning(f"Não foi possível gravar no cache: {e}")
+        if tmp_file is not None:
+            try:
+                os.unlink(tmp_file)
+            except OSError:
+                pass
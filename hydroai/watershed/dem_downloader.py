@@ -3,14 +3,67 @@ Download de DEM com suporte a OpenTopography API
 Integrado ao HydroAI
 """
 from pathlib import Path
-from typing import Optional
+from types import MappingProxyType
+from typing import Mapping, Optional
+import hashlib
 import logging
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
-from dotenv import load_dotenv
 
-# Carrega variáveis de ambiente
-load_dotenv()
+from hydroai.watershed.dem_cache import load_from_cache, store_in_cache
+
+# Pontos por requisição POST na API OpenElevation
+OPENELEVATION_BATCH_SIZE = 1000
+
+# Datasets disponíveis no OpenTopography (constante, somente leitura)
+DATASETS = MappingProxyType({
+    'SRTMGL1': MappingProxyType({
+        'name': 'SRTM 30m Global',
+        'resolution': 30,
+        'coverage': 'Global (-60° a +60°)',
+        'year': 2000,
+        'recommended': True
+    }),
+    'SRTMGL3': MappingProxyType({
+        'name': 'SRTM 90m Global',
+        'resolution': 90,
+        'coverage': 'Global (-60° a +60°)',
+        'year': 2000
+    }),
+    'ASTER': MappingProxyType({
+        'name': 'ASTER GDEM v3',
+        'resolution': 30,
+        'coverage': 'Global (-83° a +83°)',
+        'year': 2019
+    }),
+    'AW3D30': MappingProxyType({
+        'name': 'ALOS World 3D 30m',
+        'resolution': 30,
+        'coverage': 'Global',
+        'year': 2021
+    }),
+})
+
+logger = logging.getLogger(__name__)
+
+# Sessão HTTP compartilhada por todos os downloaders: reaproveita conexões
+# (keep-alive/TLS) e repete automaticamente falhas transitórias
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=64,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[429, 502, 503, 504]
+    )
+))
+
+# Tamanho dos blocos ao gravar downloads em disco (bytes), usado também
+# por downloader.py
+DOWNLOAD_CHUNK_SIZE = 1 << 20
 
 class DEMDownloader:
     """
@@ -26,9 +79,10 @@ class DEMDownloader:
         -----------
         api_key : str, optional
             Chave da API OpenTopography
-            Se não fornecida, tenta carregar de .env ou usa modo público
+            Se não fornecida, usa a variável de ambiente OPENTOPOGRAPHY_API_KEY
+            (o .env é carregado pelo main.py) ou o modo público
         """
-        self.logger = logging.getLogger(__name__)
+        self.logger = logger
         
         # Tenta obter chave de API
         self.api_key = api_key or os.getenv('OPENTOPOGRAPHY_API_KEY', None)
@@ -39,8 +93,8 @@ class DEMDownloader:
             self.logger.warning("⚠ Chave OpenTopography não encontrada")
             self.logger.warning("  Para ativar, obtenha em: https://portal.opentopography.org/myot")
         
-        self.session = requests.Session()
-        self.session.timeout = 60
+        # Timeout é passado em cada requisição (Session não tem timeout global)
+        self.session = _SESSION
     
     def download_dem(
         self,
@@ -127,6 +181,18 @@ class DEMDownloader:
         self.logger.info(f"  Bounds: W={bounds['west']:.3f}, S={bounds['south']:.3f}, "
                         f"E={bounds['east']:.3f}, N={bounds['north']:.3f}")
         
+        output_file = output_path / f"dem_{dataset}_{lat:.2f}_{lon:.2f}.tif"
+        
+        # Mesmo dataset + mesmos bounds = mesmo arquivo: usa o cache local
+        cache_key = hashlib.blake2b(
+            f"{dataset}|{bounds['west']:.5f}|{bounds['south']:.5f}|"
+            f"{bounds['east']:.5f}|{bounds['north']:.5f}".encode()
+        ).hexdigest()
+        cache_name = f"{cache_key}.tif"
+        
+        if load_from_cache(cache_name, output_file):
+            return output_file
+        
         # URL da API
         base_url = "https://portal.opentopography.org/API/globaldem"
         
@@ -142,28 +208,27 @@ class DEMDownloader:
         
         self.logger.info(f"  Enviando requisição para OpenTopography...")
         
-        try:
-            response = self.session.get(base_url, params=params)
+        # Grava em blocos de 1 MB conforme chega, sem guardar o arquivo em memória
+        with self.session.get(base_url, params=params, stream=True, timeout=300) as response:
+            if not response.ok:
+                # Lê a mensagem antes de a conexão ser liberada
+                self.logger.error(f"Erro HTTP: {response.status_code}")
+                self.logger.error(f"Mensagem: {response.text}")
             response.raise_for_status()
             
-            # Salva arquivo
-            output_file = output_path / f"dem_{dataset}_{lat:.2f}_{lon:.2f}.tif"
-            
             with open(output_file, 'wb') as f:
-                f.write(response.content)
-            
-            file_size_mb = output_file.stat().st_size / (1024 * 1024)
-            
-            self.logger.info(f"✓ Download OpenTopography concluído!")
-            self.logger.info(f"  Arquivo: {output_file.name}")
-            self.logger.info(f"  Tamanho: {file_size_mb:.2f} MB")
-            
-            return output_file
-            
-        except requests.exceptions.HTTPError as e:
-            self.logger.error(f"Erro HTTP: {response.status_code}")
-            self.logger.error(f"Mensagem: {response.text}")
-            raise
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+        
+        file_size_mb = output_file.stat().st_size / (1024 * 1024)
+        
+        self.logger.info(f"✓ Download OpenTopography concluído!")
+        self.logger.info(f"  Arquivo: {output_file.name}")
+        self.logger.info(f"  Tamanho: {file_size_mb:.2f} MB")
+        
+        store_in_cache(output_file, cache_name)
+        
+        return output_file
     
     def _download_from_openelevation(
         self,
@@ -191,32 +256,41 @@ class DEMDownloader:
             
             resolution = 0.01  # ~1km
             
-            lats = np.arange(lat_min, lat_max, resolution)
-            lons = np.arange(lon_min, lon_max, resolution)
-            
-            heights_array = np.zeros((len(lats), len(lons)))
+            # Centros dos pixels, com a linha 0 ao norte (igual ao transform);
+            # linspace garante o número exato de linhas/colunas
+            n = int(round(grid_size / resolution))
+            half = resolution / 2
+            lats = np.linspace(lat_max - half, lat_min + half, n)
+            lons = np.linspace(lon_min + half, lon_max - half, n)
+            grid_lats, grid_lons = np.meshgrid(lats, lons, indexing='ij')
             
             self.logger.info(f"  Criando grid: {len(lats)} x {len(lons)} pontos")
             self.logger.info(f"  Baixando altitudes...")
             
-            total = len(lats) * len(lons)
-            count = 0
+            # Todos os pontos em ordem linha-a-linha (mesma ordem do reshape)
+            locations = [
+                {'latitude': la, 'longitude': lo}
+                for la, lo in zip(grid_lats.ravel().tolist(), grid_lons.ravel().tolist())
+            ]
+            total = len(locations)
+            
+            # Um POST por lote em vez de uma requisição por ponto
+            url = "https://api.open-elevation.com/api/v1/lookup"
+            results = []
+            for start in range(0, total, OPENELEVATION_BATCH_SIZE):
+                batch = locations[start:start + OPENELEVATION_BATCH_SIZE]
+                
+                response = self.session.post(url, json={'locations': batch}, timeout=120)
+                response.raise_for_status()
+                
+                results.extend(response.json()['results'])
+                self.logger.info(f"    {len(results)}/{total} pontos...")
             
-            for i, lat_i in enumerate(lats):
-                for j, lon_j in enumerate(lons):
-                    url = "https://api.open-elevation.com/api/v1/lookup"
-                    params = {'locations': f'{lat_i},{lon_j}'}
-                    
-                    response = self.session.get(url, params=params)
-                    response.raise_for_status()
-                    
-                    data = response.json()
-                    if data['results']:
-                        heights_array[i, j] = data['results'][0]['elevation']
-                    
-                    count += 1
-                    if count % 50 == 0:
-                        self.logger.info(f"    {count}/{total} pontos...")
+            heights_array = np.fromiter(
+                (r['elevation'] for r in results),
+                dtype=np.float32,
+                count=total
+            ).reshape(grid_lats.shape)
             
             self.logger.info(f"  Salvando como GeoTIFF...")
             
@@ -237,7 +311,15 @@ class DEMDownloader:
                 dtype=rasterio.float32,
                 crs='EPSG:4326',
                 transform=transform,
-                compress='deflate'
+                # Blocos 256x256 + preditor de ponto flutuante: arquivo menor
+                # e leituras por janela sem descomprimir linhas inteiras
+                tiled=True,
+                blockxsize=256,
+                blockysize=256,
+                compress='deflate',
+                predictor=3,
+                zlevel=1,
+                num_threads='ALL_CPUS'
             ) as dst:
                 dst.write(heights_array.astype(rasterio.float32), 1)
             
@@ -250,32 +332,6 @@ class DEMDownloader:
             self.logger.error(f"Erro OpenElevation: {e}")
             raise
     
-    def get_datasets(self) -> dict:
-        """Retorna datasets disponíveis no OpenTopography"""
-        return {
-            'SRTMGL1': {
-                'name': 'SRTM 30m Global',
-                'resolution': 30,
-                'coverage': 'Global (-60° a +60°)',
-                'year': 2000,
-                'recommended': True
-            },
-            'SRTMGL3': {
-                'name': 'SRTM 90m Global',
-                'resolution': 90,
-                'coverage': 'Global (-60° a +60°)',
-                'year': 2000
-            },
-            'ASTER': {
-                'name': 'ASTER GDEM v3',
-                'resolution': 30,
-                'coverage': 'Global (-83° a +83°)',
-                'year': 2019
-            },
-            'AW3D30': {
-                'name': 'ALOS World 3D 30m',
-                'resolution': 30,
-                'coverage': 'Global',
-                'year': 2021
-            }
-        }
+    def get_datasets(self) -> Mapping:
+        """Retorna datasets disponíveis no OpenTopography (somente leitura)"""
+        return DATASETS
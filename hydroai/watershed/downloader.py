@@ -3,9 +3,75 @@ Download automático de DEM (Digital Elevation Model)
 Obtém dados SRTM a partir de coordenadas lat/lon via Google Earth Engine
 """
 from pathlib import Path
-from typing import Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import List, Mapping, Tuple, Optional
 import logging
-import ee
+import math
+import shutil
+import tarfile
+import threading
+import rasterio
+from rasterio.merge import merge
+from rasterio.warp import transform_bounds
+from rasterio.windows import Window, from_bounds
+
+# Earth Engine é opcional: sem ele, restam os downloads USGS e GCS
+try:
+    import ee
+    _HAS_EE = True
+except ImportError:
+    _HAS_EE = False
+
+from hydroai.watershed.dem_cache import load_from_cache, store_in_cache
+from hydroai.watershed.dem_downloader import DOWNLOAD_CHUNK_SIZE, _SESSION
+
+logger = logging.getLogger(__name__)
+
+# Tiles SRTM 5°x5° (CGIAR) no object store do SDSC
+SRTM_TILE_URL = "https://cloud.sdsc.edu/v1:AUTH_object_store/Raster/SRTM_GL30/SRTM_GL30_srtm/{tile}.tar.gz"
+
+# Downloads simultâneos de tiles
+MAX_TILE_WORKERS = 16
+
+# Tipos de DEM disponíveis (constante, somente leitura)
+_DEM_TYPES = MappingProxyType({
+    'SRTM30': MappingProxyType({
+        'description': 'SRTM 30m (NASA/USGS)',
+        'resolution': 30,
+        'coverage': 'Global',
+        'year': 2000,
+        'recommended': True
+    }),
+    'SRTM90': MappingProxyType({
+        'description': 'SRTM 90m (CGIAR)',
+        'resolution': 90,
+        'coverage': 'Global',
+        'year': 2000,
+        'fast': True
+    }),
+    'MERIT': MappingProxyType({
+        'description': 'MERIT Hydro (optimizado para hidrologia)',
+        'resolution': 90,
+        'coverage': 'Global',
+        'year': 2015,
+        'recommended_for_hydrology': True
+    }),
+    'COPERNICUS': MappingProxyType({
+        'description': 'Copernicus DEM 30m (ESA)',
+        'resolution': 30,
+        'coverage': 'Global',
+        'year': 2021,
+    }),
+})
+
+# Assets do Earth Engine por tipo de DEM: (imagem, banda ou None)
+_DEM_ASSETS = {
+    'SRTM30': ('USGS/SRTMGL1_Ellip/SRTMGL1_Ellip_srtm', None),
+    'SRTM90': ('CGIAR/SRTM90_V4', None),
+    'MERIT': ('MERIT/Hydro/v1_0_1', 'elv'),
+    'COPERNICUS': ('COPERNICUS/DEM/GLO30', None),
+}
 
 class DEMDownloader:
     """
@@ -29,15 +95,28 @@ class DEMDownloader:
     )
     """
     
+    # ee.Initialize() é feito uma vez por processo, não por instância
+    _ee_initialized = False
+    _ee_lock = threading.Lock()
+    
     def __init__(self):
         """Inicializa downloader"""
-        self.logger = logging.getLogger(__name__)
+        self.logger = logger
         
-        try:
-            ee.Initialize()
-            self.logger.info("Google Earth Engine inicializado")
-        except Exception as e:
-            self.logger.warning(f"GEE não disponível: {e}. Use download_dem_usgs().")
+        if not _HAS_EE:
+            self.logger.warning("earthengine-api não instalado. Use download_dem_usgs().")
+            return
+        
+        with DEMDownloader._ee_lock:
+            if DEMDownloader._ee_initialized:
+                return
+            
+            try:
+                ee.Initialize()
+                DEMDownloader._ee_initialized = True
+                self.logger.info("Google Earth Engine inicializado")
+            except Exception as e:
+                self.logger.warning(f"GEE não disponível: {e}. Use download_dem_usgs().")
     
     def download_dem(
         self,
@@ -74,6 +153,9 @@ class DEMDownloader:
         Path
             Caminho do arquivo DEM baixado
         """
+        if not _HAS_EE:
+            raise ImportError("earthengine-api não instalado. Execute: pip install earthengine-api")
+        
         if output_dir is None:
             output_dir = Path('data/dem')
         
@@ -91,20 +173,14 @@ class DEMDownloader:
             roi = point.buffer(buffer_km * 1000)  # Converte km para metros
             
             # Seleciona dataset conforme tipo
-            if dem_type == 'SRTM30':
-                dem_image = ee.Image('USGS/SRTMGL1_Ellip/SRTMGL1_Ellip_srtm')
-                
-            elif dem_type == 'SRTM90':
-                dem_image = ee.Image('CGIAR/SRTM90_V4')
-                
-            elif dem_type == 'MERIT':
-                dem_image = ee.Image('MERIT/Hydro/v1_0_1').select('elv')
-                
-            elif dem_type == 'COPERNICUS':
-                dem_image = ee.Image('COPERNICUS/DEM/GLO30')
-                
-            else:
-                raise ValueError(f"Tipo DEM desconhecido: {dem_type}")
+            try:
+                asset, band = _DEM_ASSETS[dem_type]
+            except KeyError:
+                raise ValueError(f"Tipo DEM desconhecido: {dem_type}") from None
+            
+            dem_image = ee.Image(asset)
+            if band is not None:
+                dem_image = dem_image.select(band)
             
             # Recorta para área de interesse
             dem_clipped = dem_image.clip(roi)
@@ -154,18 +230,24 @@ class DEMDownloader:
         self,
         lat: float,
         lon: float,
-        output_dir: Path = None
+        output_dir: Path = None,
+        buffer_km: float = 50
     ) -> Path:
         """
         Download via USGS OpenTopography (alternativa sem GEE)
         Requer: pip install requests
         
+        Todos os tiles SRTM que cobrem a área são baixados em paralelo;
+        se houver mais de um, o resultado é o mosaico recortado à área.
+        
         Parameters:
         -----------
         lat, lon : float
             Coordenadas
         output_dir : Path
             Diretório de saída
+        buffer_km : float
+            Raio da área em km
             
         Returns:
         --------
@@ -181,48 +263,156 @@ class DEMDownloader:
         self.logger.info(f"Baixando SRTM via USGS OpenTopography...")
         
         try:
-            import requests
-            from io import BytesIO
-            import rasterio
-            from rasterio.io import MemoryFile
-            
-            # URL da API USGS OpenTopography
-            # Retorna tile SRTM 30m
-            url = f"https://cloud.sdsc.edu/v1:AUTH_object_store/Raster/SRTM_GL30/SRTM_GL30_srtm/{self._get_srtm_tile(lat, lon)}.tar.gz"
-            
-            self.logger.info(f"URL: {url}")
-            
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            
             filename = f"srtm_{lat:.2f}_{lon:.2f}.tif"
             output_path = output_dir / filename
             
-            with open(output_path, 'wb') as f:
-                f.write(response.content)
+            tiles = self._get_srtm_tiles_bbox(lat, lon, buffer_km)
+            if len(tiles) == 1:
+                self._fetch_tile(tiles[0], output_path)
+            else:
+                # Área na divisa entre tiles: mosaico de todos, recortado
+                tile_paths = self.download_dem_usgs_tiles(lat, lon, buffer_km, output_dir)
+                buffer_deg = buffer_km / 111.0
+                self._mosaic_tiles(
+                    tile_paths,
+                    (lon - buffer_deg, lat - buffer_deg, lon + buffer_deg, lat + buffer_deg),
+                    output_path
+                )
             
             self.logger.info(f"✓ DEM baixado: {output_path}")
             
             return output_path
             
-        except ImportError:
-            self.logger.error("requests não instalado. Execute: pip install requests")
+        except Exception as e:
+            self.logger.error(f"Erro: {e}")
             raise
+    
+    def download_dem_usgs_tiles(
+        self,
+        lat: float,
+        lon: float,
+        buffer_km: float = 50,
+        output_dir: Path = None
+    ) -> List[Path]:
+        """
+        Baixa todos os tiles SRTM que cobrem a área, em paralelo
+        
+        O tempo total passa a ser o do tile mais lento, e não a soma
+        de todos os downloads.
+        
+        Parameters:
+        -----------
+        lat, lon : float
+            Coordenadas do ponto central
+        buffer_km : float
+            Raio da área em km
+        output_dir : Path
+            Diretório de saída
+            
+        Returns:
+        --------
+        list
+            Caminhos dos arquivos baixados (um por tile)
+        """
+        if output_dir is None:
+            output_dir = Path('data/dem')
+        
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        tiles = self._get_srtm_tiles_bbox(lat, lon, buffer_km)
+        self.logger.info(f"Baixando {len(tiles)} tile(s) SRTM via USGS OpenTopography...")
+        
+        jobs = [(tile, output_dir / f"{tile}.tif") for tile in tiles]
+        
+        try:
+            with ThreadPoolExecutor(max_workers=min(MAX_TILE_WORKERS, len(jobs))) as executor:
+                paths = list(executor.map(lambda job: self._fetch_tile(*job), jobs))
         except Exception as e:
             self.logger.error(f"Erro: {e}")
             raise
+        
+        self.logger.info(f"✓ {len(paths)} tile(s) baixado(s) em: {output_dir}")
+        
+        return paths
+    
+    def _mosaic_tiles(
+        self,
+        tile_paths: List[Path],
+        bounds: Tuple[float, float, float, float],
+        output_path: Path
+    ) -> Path:
+        """Junta os tiles em um único GeoTIFF recortado a bounds (lon/lat)"""
+        sources = [rasterio.open(path) for path in tile_paths]
+        
+        try:
+            mosaic, transform = merge(sources, bounds=bounds)
+            profile = sources[0].profile
+        finally:
+            for src in sources:
+                src.close()
+        
+        profile.update(
+            driver='GTiff',
+            height=mosaic.shape[1],
+            width=mosaic.shape[2],
+            transform=transform,
+            compress='lzw'
+        )
+        
+        with rasterio.open(output_path, 'w', **profile) as dst:
+            dst.write(mosaic)
+        
+        return output_path
+    
+    def _fetch_tile(self, tile: str, output_path: Path) -> Path:
+        """
+        Baixa um tile em streaming, direto para o disco
+        
+        O GeoTIFF é extraído do .tar.gz durante o download (tarfile em
+        modo streaming) e salvo em output_path, sem guardar o arquivo
+        inteiro em memória. Tiles já baixados vêm do cache local.
+        """
+        cache_name = f"usgs_{tile}.tif"
+        if load_from_cache(cache_name, output_path):
+            return output_path
+        
+        url = SRTM_TILE_URL.format(tile=tile)
+        self.logger.info(f"URL: {url}")
+        
+        with _SESSION.get(url, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            
+            # SRTM_TILE_URL sempre aponta para um .tar.gz
+            response.raw.decode_content = True
+            with tarfile.open(fileobj=response.raw, mode='r|gz') as tar:
+                for member in tar:
+                    if member.isfile() and member.name.lower().endswith(('.tif', '.tiff')):
+                        with open(output_path, 'wb') as f:
+                            shutil.copyfileobj(tar.extractfile(member), f, DOWNLOAD_CHUNK_SIZE)
+                        break
+                else:
+                    raise ValueError(f"Nenhum GeoTIFF encontrado em: {url}")
+        
+        store_in_cache(output_path, cache_name)
+        
+        return output_path
     
     def download_from_google_cloud(
         self,
         lat: float,
         lon: float,
         output_dir: Path = None,
-        dem_type: str = 'SRTM30'
+        dem_type: str = 'SRTM30',
+        buffer_km: float = 50
     ) -> Path:
         """
         Download direto de Google Cloud Storage (mais rápido)
         Usa rasterio virtual file system
         
+        Lê apenas a janela da área de interesse (requisições HTTP por
+        faixa de bytes), sem baixar e decodificar o tile inteiro.
+        
         Parameters:
         -----------
         lat, lon : float
@@ -231,6 +421,8 @@ class DEMDownloader:
             Diretório de saída
         dem_type : str
             Tipo de DEM disponível no GCS
+        buffer_km : float
+            Raio da área a recortar em km
             
         Returns:
         --------
@@ -246,15 +438,10 @@ class DEMDownloader:
         self.logger.info(f"Baixando {dem_type} de Google Cloud Storage...")
         
         try:
-            import rasterio
-            from rasterio.vrt import WarpedVRT
-            from rasterio.io import MemoryFile
-            import numpy as np
-            
             # URLs dos arquivos no GCS
             gcs_urls = {
-                'SRTM30': '/vsicurl_streaming/https://storage.googleapis.com/dem_tiles/srtm30m/{z}/{x}/{y}.tif',
-                'GEBCO': '/vsicurl_streaming/https://storage.googleapis.com/dem_tiles/gebco/{z}/{x}/{y}.tif',
+                'SRTM30': '/vsicurl/https://storage.googleapis.com/dem_tiles/srtm30m/{z}/{x}/{y}.tif',
+                'GEBCO': '/vsicurl/https://storage.googleapis.com/dem_tiles/gebco/{z}/{x}/{y}.tif',
             }
             
             # Calcula tile
@@ -262,20 +449,53 @@ class DEMDownloader:
             
             url = gcs_urls[dem_type].format(z=7, x=tile_x, y=tile_y)
             
+            # Área de interesse em WGS84 (1 grau ≈ 111 km)
+            buffer_deg = buffer_km / 111.0
+            aoi = (lon - buffer_deg, lat - buffer_deg, lon + buffer_deg, lat + buffer_deg)
+            
+            filename = f"{dem_type}_{lat:.2f}_{lon:.2f}.tif"
+            output_path = output_dir / filename
+            
+            # Mesmo tile + mesma janela = mesmo arquivo
+            cache_name = f"gcs_{dem_type}_7_{tile_x}_{tile_y}_{lat:.2f}_{lon:.2f}_{buffer_km:g}km.tif"
+            if load_from_cache(cache_name, output_path):
+                return output_path
+            
             self.logger.info(f"URL: {url}")
             
-            # Lê diretamente do GCS
-            with rasterio.open(url) as src:
-                data = src.read()
-                profile = src.profile
-                
-                filename = f"{dem_type}_{lat:.2f}_{lon:.2f}.tif"
-                output_path = output_dir / filename
+            # Lê diretamente do GCS, sem sondar o diretório remoto; os blocos
+            # da janela vêm em requisições multi-range (faixas vizinhas unidas)
+            with rasterio.Env(
+                GDAL_DISABLE_READDIR_ON_OPEN='EMPTY_DIR',
+                CPL_VSIL_CURL_ALLOWED_EXTENSIONS='.tif',
+                GDAL_HTTP_MULTIRANGE='YES',
+                GDAL_HTTP_MERGE_CONSECUTIVE_RANGES='YES',
+                CPL_VSIL_CURL_CACHE_SIZE='200000000',
+                VSI_CACHE='TRUE'
+            ):
+                with rasterio.open(url) as src:
+                    # Janela da AOI no CRS do tile, limitada à extensão do raster
+                    window = from_bounds(
+                        *transform_bounds('EPSG:4326', src.crs, *aoi),
+                        transform=src.transform
+                    ).round_offsets().round_lengths()
+                    window = window.intersection(Window(0, 0, src.width, src.height))
+                    
+                    data = src.read(window=window)
+                    
+                    profile = src.profile
+                    profile.update(
+                        height=window.height,
+                        width=window.width,
+                        transform=src.window_transform(window)
+                    )
                 
                 # Salva localmente
                 with rasterio.open(output_path, 'w', **profile) as dst:
                     dst.write(data)
             
+            store_in_cache(output_path, cache_name)
+            
             self.logger.info(f"✓ DEM baixado: {output_path}")
             
             return output_path
@@ -296,6 +516,30 @@ class DEMDownloader:
         
         return f"srtm_{x:02d}_{y:02d}"
     
+    def _get_srtm_tiles_bbox(
+        self,
+        lat: float,
+        lon: float,
+        buffer_km: float
+    ) -> List[str]:
+        """
+        Lista os tiles SRTM que intersectam o quadrado de raio buffer_km
+        
+        1 grau ≈ 111 km (mesma aproximação usada no resto do módulo)
+        """
+        buffer_deg = buffer_km / 111.0
+        
+        x_min = int((lon - buffer_deg + 180) / 5)
+        x_max = int((lon + buffer_deg + 180) / 5)
+        y_min = int((lat - buffer_deg + 60) / 5)
+        y_max = int((lat + buffer_deg + 60) / 5)
+        
+        return [
+            f"srtm_{x:02d}_{y:02d}"
+            for x in range(x_min, x_max + 1)
+            for y in range(y_min, y_max + 1)
+        ]
+    
     def _lat_lon_to_tile(
         self,
         lat: float,
@@ -303,8 +547,6 @@ class DEMDownloader:
         zoom: int
     ) -> Tuple[int, int]:
         """Converte lat/lon para tile x,y (Web Mercator)"""
-        import math
-        
         n = 2.0 ** zoom
         x = int((lon + 180.0) / 360.0 * n)
         
@@ -315,34 +557,6 @@ class DEMDownloader:
         
         return x, y
     
-    def get_available_dem_types(self) -> dict:
-        """Retorna tipos de DEM disponíveis"""
-        return {
-            'SRTM30': {
-                'description': 'SRTM 30m (NASA/USGS)',
-                'resolution': 30,
-                'coverage': 'Global',
-                'year': 2000,
-                'recommended': True
-            },
-            'SRTM90': {
-                'description': 'SRTM 90m (CGIAR)',
-                'resolution': 90,
-                'coverage': 'Global',
-                'year': 2000,
-                'fast': True
-            },
-            'MERIT': {
-                'description': 'MERIT Hydro (optimizado para hidrologia)',
-                'resolution': 90,
-                'coverage': 'Global',
-                'year': 2015,
-                'recommended_for_hydrology': True
-            },
-            'COPERNICUS': {
-                'description': 'Copernicus DEM 30m (ESA)',
-                'resolution': 30,
-                'coverage': 'Global',
-                'year': 2021,
-            }
-        }
+    def get_available_dem_types(self) -> Mapping:
+        """Retorna tipos de DEM disponíveis (mapeamento somente leitura)"""
+        return _DEM_TYPES
@@ -3,16 +3,50 @@ Wrapper para PySheds - Delimitação de bacias hidrográficas
 Integra PySheds ao HydroAI com interface simples
 """
 from pathlib import Path
-from typing import Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Sequence, Tuple, Optional
+import hashlib
 import logging
+import os
+import tempfile
+import time
 import numpy as np
+import pyproj
 import geopandas as gpd
+import shapely
 from shapely.geometry import shape
 import rasterio
+import rasterio.features
+from rasterio.errors import RasterioIOError
 from rasterio.transform import Affine
+from rasterio.windows import Window, from_bounds, transform as window_transform
 from pysheds.grid import Grid
-import tempfile
-import os
+from pysheds.sview import Raster, ViewFinder
+
+from hydroai.watershed.dem_cache import DEM_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Acima desta área (km²) o Shapefile não é gravado
+SHAPEFILE_MAX_AREA_KM2 = 1000
+
+# Formatos de saída: extensão -> (nome, driver OGR)
+OUTPUT_DRIVERS = {
+    'gpkg': ('GeoPackage', 'GPKG'),
+    'geojson': ('GeoJSON', 'GeoJSON'),
+    'shp': ('Shapefile', 'ESRI Shapefile'),
+}
+
+# Implementações aceitas por preprocess_dem
+PREPROCESS_BACKENDS = ('numba', 'richdem', 'pysheds')
+
+# Nodata finito passado ao RichDEM quando o DEM usa NaN
+RICHDEM_NODATA = -9999
+
+# Limites do cache de fdir/acc em DEM_CACHE_DIR/flow: número de DEMs e
+# espaço total em disco (MB, sobrescrevível via HYDROAI_FLOW_CACHE_MAX_MB)
+FLOW_CACHE_MAX_ENTRIES = 16
+FLOW_CACHE_MAX_BYTES = int(os.environ.get('HYDROAI_FLOW_CACHE_MAX_MB', 2048)) * 1024 * 1024
 
 class PySheksWrapper:
     """
@@ -20,16 +54,39 @@ class PySheksWrapper:
     Realiza delimitação de bacias a partir de um DEM (Digital Elevation Model)
     """
     
-    def __init__(self):
-        """Inicializa wrapper do PySheds"""
-        self.logger = logging.getLogger(__name__)
+    def __init__(self, verbose: bool = True, flow_cache: bool = True):
+        """
+        Inicializa wrapper do PySheds
+        
+        Parameters:
+        -----------
+        verbose : bool
+            Se False, a delimitação de cada exutório não registra as
+            etapas intermediárias (apenas resumos e erros)
+        flow_cache : bool
+            Se False, fdir/acc não são lidos nem gravados no cache em disco
+            (DEM_CACHE_DIR/flow, por padrão ~/.cache/hydroai/dem/flow)
+        """
+        self.logger = logger
+        self._verbose = verbose
+        self._use_flow_cache = flow_cache
         self.grid = None
         self.dem = None
         self.fdir = None
         self.acc = None
         self.dem_path = None
+        # Identifica o DEM carregado: (caminho, mtime_ns, tamanho, janela, memmap, dtype)
+        self._dem_key = None
+        # Chave do cache de fdir/acc atualmente em memória
+        self._flow_key = None
         
-    def load_dem(self, dem_path: Path) -> Grid:
+    def load_dem(
+        self,
+        dem_path: Path,
+        window: Optional[Tuple[float, float, float, float]] = None,
+        memmap: bool = False,
+        dtype: Optional[str] = 'float32'
+    ) -> Grid:
         """
         Carrega DEM (Digital Elevation Model)
         
@@ -37,6 +94,18 @@ class PySheksWrapper:
         -----------
         dem_path : Path
             Caminho para arquivo DEM (GeoTIFF)
+        window : tuple, optional
+            Extensão (xmin, ymin, xmax, ymax) no CRS do DEM. Se informada,
+            apenas essa janela é lida do arquivo, e a memória fica limitada
+            à área de interesse em vez do DEM inteiro.
+        memmap : bool
+            Se True, o DEM é lido para um arquivo temporário mapeado em
+            memória (np.memmap): as páginas ficam sob controle do sistema
+            operacional, que pode descartá-las sob pressão de memória.
+        dtype : str, optional
+            Tipo das elevações em memória (padrão float32, precisão de
+            sobra para hidrologia e metade da banda de float64). None
+            mantém o tipo do arquivo.
             
         Returns:
         --------
@@ -45,16 +114,25 @@ class PySheksWrapper:
         """
         dem_path = Path(dem_path)
         
-        if not dem_path.exists():
-            raise FileNotFoundError(f"DEM não encontrado: {dem_path}")
+        try:
+            st = dem_path.stat()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"DEM não encontrado: {dem_path}") from None
+        
+        # Mesmo arquivo (inalterado) e mesma janela: reaproveita a grid já lida
+        dem_key = (str(dem_path.resolve()), st.st_mtime_ns, st.st_size, window, memmap, dtype)
+        if self.dem is not None and dem_key == self._dem_key:
+            self.logger.info(f"DEM já carregado: {dem_path}")
+            return self.grid
         
         self.logger.info(f"Carregando DEM: {dem_path}")
         self.dem_path = dem_path
         
         try:
-            # Carrega grid a partir do DEM
-            self.grid = Grid.from_raster(str(dem_path))
-            self.dem = self.grid.read_raster(str(dem_path))
+            # Uma única abertura do arquivo: metadados e dados juntos
+            self.dem = self._read_dem(dem_path, window, dtype, memmap)
+            self.grid = Grid.from_raster(self.dem)
+            self._dem_key = dem_key
             
             self.logger.info(f"DEM carregado com sucesso")
             self.logger.info(f"  - Dimensões: {self.dem.shape}")
@@ -62,14 +140,80 @@ class PySheksWrapper:
             
             return self.grid
             
-        except Exception as e:
+        except (RasterioIOError, ValueError, MemoryError) as e:
+            # Sem traceback: quem chamou registra a exceção uma única vez
             self.logger.error(f"Erro ao carregar DEM: {e}")
             raise
     
-    def preprocess_dem(self) -> np.ndarray:
+    def _read_dem(
+        self,
+        dem_path: Path,
+        window: Optional[Tuple[float, float, float, float]] = None,
+        dtype: Optional[str] = None,
+        memmap: bool = False
+    ) -> Raster:
+        """
+        Lê a banda 1 do DEM com uma única abertura do rasterio
+        
+        O GDAL já converte para dtype durante a decodificação, sem buffer
+        intermediário. Com memmap, o destino é um np.memmap em arquivo
+        temporário anônimo (removido ao ser fechado); o mapeamento
+        continua válido enquanto o array existir.
+        """
+        with rasterio.Env(
+            GDAL_DISABLE_READDIR_ON_OPEN='EMPTY_DIR',
+            CPL_VSIL_CURL_ALLOWED_EXTENSIONS='.tif',
+            VSI_CACHE='TRUE'
+        ), rasterio.open(str(dem_path)) as src:
+            if window is None:
+                win = Window(0, 0, src.width, src.height)
+            else:
+                win = from_bounds(*window, transform=src.transform)
+                win = win.round_offsets().round_lengths()
+                win = win.intersection(Window(0, 0, src.width, src.height))
+            
+            shape_ = (int(win.height), int(win.width))
+            dtype = dtype or src.dtypes[0]
+            
+            if memmap:
+                with tempfile.TemporaryFile(suffix='.dem') as tmp:
+                    data = np.memmap(tmp, dtype=dtype, mode='w+', shape=shape_)
+            else:
+                data = np.empty(shape_, dtype=dtype)
+            src.read(1, window=win, out=data)
+            
+            nodata = src.nodata
+            if nodata is None:
+                nodata = np.nan if np.issubdtype(data.dtype, np.floating) else 0
+            
+            viewfinder = ViewFinder(
+                affine=src.window_transform(win),
+                shape=shape_,
+                crs=pyproj.Proj(src.crs, preserve_units=True),
+                nodata=data.dtype.type(nodata)
+            )
+        
+        return Raster(data, viewfinder=viewfinder)
+    
+    def preprocess_dem(self, backend: str = 'numba', strict: bool = False) -> np.ndarray:
         """
         Pré-processa DEM (preenche depressões, etc)
         
+        Parameters:
+        -----------
+        backend : str
+            Implementação usada:
+            - 'numba': Priority-Flood+Epsilon compilado, uma única passada
+              sobre o DEM (padrão)
+            - 'richdem': FillDepressions + ResolveFlats do RichDEM (C++,
+              requer pip install richdem)
+            - 'pysheds': fill_depressions e resolve_flats do PySheds,
+              útil para comparar resultados
+        strict : bool
+            Só para backend='pysheds': roda também fill_pits antes de
+            fill_depressions, como o fluxo original do PySheds (os poços
+            de uma célula já são preenchidos por fill_depressions)
+        
         Returns:
         --------
         ndarray
@@ -78,26 +222,76 @@ class PySheksWrapper:
         if self.dem is None:
             raise ValueError("Carregue DEM primeiro com load_dem()")
         
-        self.logger.info("Pré-processando DEM...")
+        if backend not in PREPROCESS_BACKENDS:
+            raise ValueError(f"Backend desconhecido: {backend}")
+        
+        self.logger.info(f"Pré-processando DEM ({backend})...")
         
         try:
-            # 1. Preenche depressões pequenas
-            self.logger.info("  1. Preenchendo poços...")
-            dem_filled = self.grid.fill_pits(self.dem)
-            
-            # 2. Preenche depressões maiores
-            self.logger.info("  2. Preenchendo depressões...")
-            dem_flooded = self.grid.fill_depressions(dem_filled)
-            
-            # 3. Resolve áreas planas
-            self.logger.info("  3. Resolvendo áreas planas...")
-            dem_conditioned = self.grid.resolve_flats(dem_flooded)
+            if backend == 'numba':
+                from hydroai.watershed._flood import priority_flood_fill
+                
+                self.logger.info("  Priority-Flood (poços, depressões e áreas planas)...")
+                dem_conditioned = Raster(
+                    priority_flood_fill(self.dem, self.dem.nodata),
+                    viewfinder=self.dem.viewfinder
+                )
+                
+            elif backend == 'richdem':
+                try:
+                    import richdem
+                except ImportError:
+                    self.logger.error("richdem não instalado. Execute: pip install richdem")
+                    raise
+                
+                # Cópia: o RichDEM trabalha in-place e self.dem fica em cache
+                dem_array = np.array(self.dem)
+                
+                # O RichDEM compara células com no_data por igualdade, o que
+                # nunca vale para NaN: troca NaN por um valor finito
+                no_data = self.dem.nodata
+                nan_nodata = np.isnan(no_data)
+                if nan_nodata:
+                    no_data = dem_array.dtype.type(RICHDEM_NODATA)
+                if np.issubdtype(dem_array.dtype, np.floating):
+                    dem_array[np.isnan(dem_array)] = no_data
+                
+                rd = richdem.rdarray(dem_array, no_data=no_data)
+                rd.geotransform = self.grid.affine.to_gdal()
+                
+                self.logger.info("  1. Preenchendo depressões (epsilon)...")
+                richdem.FillDepressions(rd, epsilon=True, in_place=True)
+                
+                self.logger.info("  2. Resolvendo áreas planas...")
+                richdem.ResolveFlats(rd, in_place=True)
+                
+                dem_array = np.asarray(rd)
+                if nan_nodata:
+                    # Volta ao nodata do viewfinder (NaN)
+                    dem_array[dem_array == no_data] = np.nan
+                
+                dem_conditioned = Raster(dem_array, viewfinder=self.dem.viewfinder)
+                
+            else:
+                # 1. Preenche depressões pequenas (já coberto pelo passo 2)
+                dem_filled = self.dem
+                if strict:
+                    self.logger.info("  1. Preenchendo poços...")
+                    dem_filled = self.grid.fill_pits(self.dem)
+                
+                # 2. Preenche depressões
+                self.logger.info("  2. Preenchendo depressões...")
+                dem_flooded = self.grid.fill_depressions(dem_filled)
+                
+                # 3. Resolve áreas planas
+                self.logger.info("  3. Resolvendo áreas planas...")
+                dem_conditioned = self.grid.resolve_flats(dem_flooded)
             
             self.logger.info("DEM pré-processado com sucesso")
             
             return dem_conditioned
             
-        except Exception as e:
+        except (ValueError, MemoryError) as e:
             self.logger.error(f"Erro no pré-processamento: {e}")
             raise
     
@@ -117,19 +311,16 @@ class PySheksWrapper:
         """
         self.logger.info("Calculando direção de fluxo...")
         
-        try:
-            # Routing D8 (8 direções)
-            fdir = self.grid.flowdir(dem_conditioned, routing='d8')
-            # Converte para numpy array
-            self.fdir = np.asarray(fdir)
-            
-            self.logger.info("Direção de fluxo calculada")
-            
-            return self.fdir
-            
-        except Exception as e:
-            self.logger.error(f"Erro ao calcular direção: {e}")
-            raise
+        # Routing D8 (8 direções)
+        # Áreas planas e poços recebem 0 (sem saída, como nodata), assim
+        # todos os códigos D8 (1..128) cabem em uint8
+        fdir = self.grid.flowdir(dem_conditioned, routing='d8', flats=0, pits=0)
+        # Converte para numpy array contíguo de 1 byte por célula
+        self.fdir = np.ascontiguousarray(fdir, dtype=np.uint8)
+        
+        self.logger.info("Direção de fluxo calculada")
+        
+        return self.fdir
     
     def calculate_flow_accumulation(self) -> np.ndarray:
         """
@@ -145,27 +336,173 @@ class PySheksWrapper:
         
         self.logger.info("Calculando acumulação de fluxo...")
         
-        try:
-            acc = self.grid.accumulation(self.fdir, routing='d8')
-            # Converte para numpy array
-            self.acc = np.asarray(acc)
+        # O PySheds exige um Raster (lê fdir.nodata) e converte para int64
+        # internamente; 0 marca células sem saída
+        fdir = Raster(
+            np.asarray(self.fdir),
+            viewfinder=ViewFinder(
+                affine=self.grid.affine,
+                shape=self.fdir.shape,
+                crs=self.grid.crs,
+                nodata=np.uint8(0)
+            )
+        )
+        acc = self.grid.accumulation(fdir, routing='d8')
+        # Converte para numpy array (contagem de células cabe em int32)
+        self.acc = np.ascontiguousarray(acc, dtype=np.int32)
+        
+        self.logger.info("Acumulação calculada")
+        # int32 não tem NaN: max/min diretos, sem o ramo nan*
+        self.logger.info(f"  - Valor máximo: {self.acc.max()}")
+        self.logger.info(f"  - Valor mínimo: {self.acc.min()}")
+        
+        return self.acc
+    
+    def _prepare_flow(self, backend: str = 'numba'):
+        """
+        Garante fdir e acc do DEM carregado
+        
+        Pré-processamento e fluxo dependem só do DEM, não do exutório:
+        o resultado persiste no diretório do usuário (DEM_CACHE_DIR/flow,
+        por padrão ~/.cache/hydroai/dem/flow; 5 bytes por célula),
+        identificado por um hash do DEM, e delimitações seguintes sobre o
+        mesmo DEM pulam essas etapas. Os arrays são mapeados em memória
+        (somente leitura), então processos que usam o mesmo DEM
+        compartilham as páginas pelo cache do sistema operacional. O
+        cache fica limitado a FLOW_CACHE_MAX_ENTRIES DEMs e
+        FLOW_CACHE_MAX_BYTES, e é desligado com flow_cache=False.
+        """
+        flow_key = self._flow_cache_key(backend)
+        if flow_key == self._flow_key and self.fdir is not None:
+            return
+        
+        if not (self._use_flow_cache and self._load_flow_cache(flow_key)):
+            dem_conditioned = self.preprocess_dem(backend)
+            self.calculate_flow_direction(dem_conditioned)
+            self.calculate_flow_accumulation()
             
-            self.logger.info("Acumulação calculada")
-            self.logger.info(f"  - Valor máximo: {np.nanmax(self.acc)}")
-            self.logger.info(f"  - Valor mínimo: {np.nanmin(self.acc)}")
+            # Troca os arrays em RAM pelas versões mapeadas do cache
+            if self._use_flow_cache and self._store_flow_cache(flow_key):
+                self._load_flow_cache(flow_key)
+        
+        self._flow_key = flow_key
+    
+    def _flow_cache_key(self, backend: str) -> str:
+        """
+        Hash do DEM carregado: caminho, mtime, tamanho, janela, dtype e
+        backend (o mtime muda a cada regravação, mesmo com tamanho igual)
+        """
+        path, mtime_ns, size, window, _, dtype = self._dem_key
+        
+        return hashlib.blake2b(
+            f"{path}|{mtime_ns}|{size}|{window}|{dtype}|{backend}".encode(),
+            digest_size=8
+        ).hexdigest()
+    
+    def _load_flow_cache(self, flow_key: str) -> bool:
+        """Mapeia fdir/acc do cache em disco; retorna False se não houver"""
+        fdir_file = DEM_CACHE_DIR / 'flow' / f"{flow_key}.fdir.npy"
+        acc_file = DEM_CACHE_DIR / 'flow' / f"{flow_key}.acc.npy"
+        
+        if not (fdir_file.exists() and acc_file.exists()):
+            return False
+        
+        try:
+            fdir = np.load(fdir_file, mmap_mode='r')
+            acc = np.load(acc_file, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Cache de fluxo ilegível: {e}")
+            return False
+        
+        if fdir.shape != self.dem.shape or acc.shape != self.dem.shape:
+            return False
+        
+        # Marca o uso (o descarte remove primeiro os menos usados)
+        try:
+            os.utime(fdir_file)
+        except OSError:
+            pass
+        
+        self.fdir = fdir
+        self.acc = acc
+        self.logger.info(f"✓ Direção e acumulação de fluxo carregadas do cache ({flow_key})")
+        
+        return True
+    
+    def _store_flow_cache(self, flow_key: str) -> bool:
+        """Grava fdir/acc no cache (.npy sem compressão, mapeável)"""
+        cache_dir = DEM_CACHE_DIR / 'flow'
+        
+        if self.fdir.nbytes + self.acc.nbytes > FLOW_CACHE_MAX_BYTES:
+            self.logger.info("DEM grande demais para o cache de fluxo; não será gravado")
+            return False
+        
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
             
-            return self.acc
+            for suffix, data in (('fdir', self.fdir), ('acc', self.acc)):
+                cached_file = cache_dir / f"{flow_key}.{suffix}.npy"
+                
+                # Temporário de nome único: processos gravando a mesma chave
+                # ao mesmo tempo não escrevem no mesmo arquivo
+                fd, tmp_file = tempfile.mkstemp(
+                    prefix=cached_file.name + '.', suffix='.tmp', dir=cache_dir
+                )
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        np.save(f, data)
+                    os.replace(tmp_file, cached_file)
+                except BaseException:
+                    os.unlink(tmp_file)
+                    raise
+        except OSError as e:
+            self.logger.warning(f"Não foi possível gravar o cache de fluxo: {e}")
+            return False
+        
+        self._evict_flow_cache(cache_dir)
+        
+        return True
+    
+    def _evict_flow_cache(self, cache_dir: Path):
+        """
+        Mantém as entradas usadas mais recentemente dentro dos limites
+        FLOW_CACHE_MAX_ENTRIES e FLOW_CACHE_MAX_BYTES
+        """
+        entries = []
+        for fdir_file in cache_dir.glob('*.fdir.npy'):
+            flow_key = fdir_file.name[:-len('.fdir.npy')]
+            files = [fdir_file, cache_dir / f"{flow_key}.acc.npy"]
+            try:
+                mtime_ns = fdir_file.stat().st_mtime_ns
+                size = sum(f.stat().st_size for f in files if f.exists())
+            except OSError:
+                continue
+            entries.append((mtime_ns, size, files))
+        
+        entries.sort(key=lambda entry: entry[0], reverse=True)
+        
+        total = 0
+        for i, (_, size, files) in enumerate(entries):
+            total += size
+            if i < FLOW_CACHE_MAX_ENTRIES and total <= FLOW_CACHE_MAX_BYTES:
+                continue
             
-        except Exception as e:
-            self.logger.error(f"Erro ao calcular acumulação: {e}")
-            raise
+            for cached_file in files:
+                try:
+                    cached_file.unlink()
+                except OSError:
+                    # Ausente ou ainda mapeado por outro processo (Windows)
+                    pass
     
     def delineate_watershed(
         self,
         lat: float,
         lon: float,
         dem_path: Path,
-        output_path: Optional[Path] = None
+        output_path: Optional[Path] = None,
+        output_formats: Sequence[str] = ('gpkg',),
+        snap_to_stream: bool = False,
+        snap_window: int = 50
     ) -> gpd.GeoDataFrame:
         """
         Delimita bacia hidrográfica para um ponto de exutório
@@ -177,7 +514,14 @@ class PySheksWrapper:
         dem_path : Path
             Caminho para arquivo DEM
         output_path : Path, optional
-            Diretório para salvar shapefiles
+            Diretório para salvar o resultado
+        output_formats : sequence of str
+            Formatos gravados em output_path: 'gpkg', 'geojson', 'shp'
+        snap_to_stream : bool
+            Se True, move o exutório para a célula de maior acumulação
+            numa janela snap_window x snap_window em torno do ponto
+        snap_window : int
+            Lado da janela de busca (células)
             
         Returns:
         --------
@@ -186,115 +530,18 @@ class PySheksWrapper:
         """
         self.logger.info(f"Delimitando bacia para ponto: ({lat}, {lon})")
         
-        temp_file = None
-        
         try:
             # 1. Carrega DEM
             self.load_dem(dem_path)
             
-            # 2. Pré-processa
-            dem_conditioned = self.preprocess_dem()
-            
-            # 3. Calcula fluxo
-            self.calculate_flow_direction(dem_conditioned)
-            self.calculate_flow_accumulation()
-            
-            # 4. Converte coordenadas geográficas para índices da grid
-            self.logger.info("Convertendo coordenadas...")
-            col, row = self.grid.nearest_cell(lon, lat)
-            self.logger.info(f"  - Índices da grid: col={col}, row={row}")
+            # 2-3. Pré-processa e calcula fluxo (ou reaproveita do cache)
+            self._prepare_flow()
             
-            # 5. Delimita bacia (watershed catchment)
-            self.logger.info("Delimitando bacia...")
-            catch = self.grid.catchment(
-                x=col, 
-                y=row,
-                fdir=self.fdir,
-                routing='d8',
-                xytype='index'
+            # 4-9. Delimita e vectoriza a bacia do exutório
+            final_geom = self._catch_one(
+                lat, lon, snap_window if snap_to_stream else None, self._verbose
             )
-            
-            # 6. Salva catch em arquivo temporário PRIMEIRO
-            self.logger.info("Salvando resultado intermediário...")
-            
-            # Cria arquivo temporário
-            fd, temp_file = tempfile.mkstemp(suffix='.tif')
-            os.close(fd)
-            
-            # Converte catch para numpy array
-            catch_array = np.asarray(catch, dtype=np.float32)
-            
-            
-            # Obtém metadados do DEM original
-            with rasterio.open(str(dem_path)) as src:
-                transform = src.transform
-                crs = src.crs
-                profile = src.profile
-            
-            # Atualiza profile para o resultado
-            profile.update({
-                'dtype': rasterio.float32,
-                'count': 1,
-                'compress': 'deflate',
-                'nodata': None  # Remove nodata value
-            })
-
-            
-            # Salva array temporário
-            with rasterio.open(temp_file, 'w', **profile) as dst:
-                dst.write(catch_array, 1)
-            
-            self.logger.info(f"  - Arquivo temporário: {temp_file}")
-            
-            # 7. Lê arquivo temporário e vectoriza
-            self.logger.info("Extraindo geometria...")
-            
-            import rasterio.features
-            
-            with rasterio.open(temp_file) as src:
-                catch_data = src.read(1)
-                transform = src.transform
-                crs = src.crs
-            
-            # Cria máscara (apenas valores > 0)
-            catch_mask = (catch_data > 0).astype(np.uint8)
-            
-            self.logger.info(f"  - Máscara criada: {catch_mask.shape}")
-            self.logger.info(f"  - Pixels da bacia: {np.sum(catch_mask)}")
-            
-            # Vectoriza
-            shapes_list = list(rasterio.features.shapes(
-                catch_mask,
-                transform=transform
-            ))
-            
-            if not shapes_list:
-                raise ValueError("Nenhuma geometria foi criada")
-            
-            self.logger.info(f"  - {len(shapes_list)} shapes encontrados")
-            
-            # 8. Filtra apenas polígonos válidos
-            valid_shapes = []
-            for geom, value in shapes_list:
-                if value == 1:
-                    try:
-                        geom_obj = shape(geom)
-                        if geom_obj.is_valid and geom_obj.area > 0:
-                            valid_shapes.append(geom_obj)
-                    except Exception as e:
-                        self.logger.warning(f"  - Shape inválido: {e}")
-            
-            if not valid_shapes:
-                raise ValueError("Nenhum polígono válido encontrado")
-            
-            self.logger.info(f"  - {len(valid_shapes)} polígonos válidos")
-            
-            # 9. Combina polígonos
-            from shapely.ops import unary_union
-            if len(valid_shapes) == 1:
-                final_geom = valid_shapes[0]
-            else:
-                final_geom = unary_union(valid_shapes)
+            crs = self.grid.crs
             
             # 10. Cria GeoDataFrame
             watershed_gdf = gpd.GeoDataFrame(
@@ -304,75 +551,302 @@ class PySheksWrapper:
             )
             
             # 11. Calcula estatísticas
-            area_m2 = watershed_gdf.geometry.area.sum()
-            area_km2 = area_m2 / 1_000_000
+            stats = self.get_watershed_stats(watershed_gdf)
             
             self.logger.info("=" * 70)
             self.logger.info(f"✓ BACIA DELIMITADA COM SUCESSO!")
             self.logger.info("=" * 70)
-            self.logger.info(f"  Área: {area_km2:.2f} km²")
-            self.logger.info(f"  Área: {area_m2/10000:.2f} ha")
+            self.logger.info(f"  Área: {stats['area_km2']:.2f} km²")
+            self.logger.info(f"  Área: {stats['area_ha']:.2f} ha")
             self.logger.info(f"  CRS: {crs}")
             self.logger.info("=" * 70)
             
             # 12. Salva resultado se solicitado
             if output_path:
-                output_path = Path(output_path)
-                output_path.mkdir(parents=True, exist_ok=True)
-                
-                try:
-                    shapefile_path = output_path / 'watershed.shp'
-                    watershed_gdf.to_file(shapefile_path)
-                    self.logger.info(f"✓ Shapefile salvo: {shapefile_path}")
-                except Exception as e:
-                    self.logger.warning(f"Erro ao salvar shapefile: {e}")
-                
-                try:
-                    gpkg_path = output_path / 'watershed.gpkg'
-                    watershed_gdf.to_file(gpkg_path, driver='GPKG')
-                    self.logger.info(f"✓ GeoPackage salvo: {gpkg_path}")
-                except Exception as e:
-                    self.logger.warning(f"Erro ao salvar GeoPackage: {e}")
-                
-                try:
-                    geojson_path = output_path / 'watershed.geojson'
-                    watershed_gdf.to_file(geojson_path, driver='GeoJSON')
-                    self.logger.info(f"✓ GeoJSON salvo: {geojson_path}")
-                except Exception as e:
-                    self.logger.warning(f"Erro ao salvar GeoJSON: {e}")
+                self._save_outputs(
+                    watershed_gdf, Path(output_path), 'watershed',
+                    output_formats, stats['area_km2']
+                )
             
             return watershed_gdf
             
-        except Exception as e:
-            self.logger.error("=" * 70)
-            self.logger.error(f"❌ ERRO AO DELIMITAR BACIA")
-            self.logger.error("=" * 70)
-            self.logger.error(f"Erro: {e}")
-            import traceback
-            self.logger.error(traceback.format_exc())
-            self.logger.error("=" * 70)
+        except Exception:
+            self.logger.exception("❌ ERRO AO DELIMITAR BACIA")
             raise
+    
+    def delineate_many(
+        self,
+        outlets: List[Tuple[float, float]],
+        dem_path: Path,
+        output_path: Optional[Path] = None,
+        max_workers: Optional[int] = None,
+        output_formats: Sequence[str] = ('gpkg',),
+        snap_to_stream: bool = False,
+        snap_window: int = 50
+    ) -> gpd.GeoDataFrame:
+        """
+        Delimita bacias para vários exutórios sobre o mesmo DEM
+        
+        Carregamento, pré-processamento e direção de fluxo são feitos uma
+        única vez; apenas a delimitação de cada exutório roda em paralelo
+        (threads compartilhando a mesma matriz fdir).
+        
+        Parameters:
+        -----------
+        outlets : list of (lat, lon)
+            Coordenadas geográficas (WGS84) dos exutórios
+        dem_path : Path
+            Caminho para arquivo DEM
+        output_path : Path, optional
+            Diretório para salvar os arquivos
+        max_workers : int, optional
+            Número de threads (padrão: os.cpu_count())
+        output_formats : sequence of str
+            Formatos gravados em output_path: 'gpkg', 'geojson', 'shp'
+        snap_to_stream : bool
+            Se True, move o exutório para a célula de maior acumulação
+            numa janela snap_window x snap_window em torno do ponto
+        snap_window : int
+            Lado da janela de busca (células)
+            
+        Returns:
+        --------
+        GeoDataFrame
+            Uma linha por exutório, na ordem de entrada
+        """
+        self.logger.info(f"Delimitando {len(outlets)} bacias")
+        
+        self.load_dem(dem_path)
+        self._prepare_flow()
+        
+        snap = snap_window if snap_to_stream else None
+        
+        # Sem log por exutório: só um resumo com os tempos ao final
+        def catch_timed(outlet):
+            start = time.perf_counter()
+            geom = self._catch_one(*outlet, snap, verbose=False)
+            return geom, time.perf_counter() - start
+        
+        with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+            results = list(executor.map(catch_timed, outlets))
         
-        finally:
-            # Limpa arquivo temporário
-            if temp_file and os.path.exists(temp_file):
+        geoms = [geom for geom, _ in results]
+        elapsed = np.array([seconds for _, seconds in results])
+        
+        watersheds_gdf = gpd.GeoDataFrame(
+            {
+                'id': range(1, len(outlets) + 1),
+                'lat': [lat for lat, _ in outlets],
+                'lon': [lon for _, lon in outlets],
+            },
+            geometry=geoms,
+            crs=self.grid.crs
+        )
+        
+        if len(elapsed):
+            self.logger.info(
+                f"✓ {len(watersheds_gdf)} bacias delimitadas "
+                f"(por exutório: mín {elapsed.min():.3f}s, "
+                f"máx {elapsed.max():.3f}s, média {elapsed.mean():.3f}s)"
+            )
+        
+        if output_path:
+            self._save_outputs(watersheds_gdf, Path(output_path), 'watersheds', output_formats)
+        
+        return watersheds_gdf
+    
+    def _catch_one(
+        self,
+        lat: float,
+        lon: float,
+        snap_window: Optional[int] = None,
+        verbose: bool = True
+    ):
+        """
+        Delimita e vectoriza a bacia de um exutório
+        
+        Usa a grid e a direção de fluxo já calculadas; não altera o estado
+        do wrapper, por isso pode rodar em várias threads ao mesmo tempo.
+        Com snap_window, o exutório é ajustado ao curso d'água mais
+        próximo antes da delimitação. Com verbose=False, nenhuma etapa é
+        registrada (uso em lote).
+        
+        Returns:
+        --------
+        shapely geometry
+            Polígono (ou multipolígono) da bacia
+        """
+        # 4. Converte coordenadas geográficas para índices da grid
+        col, row = self.grid.nearest_cell(lon, lat)
+        if verbose:
+            self.logger.info(f"Convertendo coordenadas: col={col}, row={row}")
+        
+        if snap_window:
+            row, col = self._snap_to_stream(row, col, snap_window)
+            if verbose:
+                self.logger.info(f"  - Ajustado ao curso d'água: col={col}, row={row}")
+        
+        # 5. Delimita bacia (D8 reverso compilado a partir do exutório)
+        from hydroai.watershed._catchment import catchment_mask
+        
+        catch = catchment_mask(self.fdir, row, col)
+        
+        # 6. Georreferência da grid carregada (vale também para leitura em janela)
+        transform = self.grid.affine
+        
+        # 7. Vectoriza direto do array em memória
+        # Recorta ao retângulo envolvente da bacia: o vetorizador percorre
+        # só essa janela, e não a grid inteira
+        rows = np.flatnonzero(catch.any(axis=1))
+        cols = np.flatnonzero(catch.any(axis=0))
+        if rows.size == 0:
+            raise ValueError("Nenhuma geometria foi criada")
+        
+        y0, y1 = rows[0], rows[-1] + 1
+        x0, x1 = cols[0], cols[-1] + 1
+        catch_mask = np.ascontiguousarray(catch[y0:y1, x0:x1], dtype=np.uint8)
+        transform = window_transform(Window(x0, y0, x1 - x0, y1 - y0), transform)
+        
+        if verbose:
+            self.logger.info(
+                f"Extraindo geometria: máscara {catch_mask.shape}, "
+                f"{np.count_nonzero(catch_mask)} pixels da bacia"
+            )
+        
+        # Vectoriza só os pixels da bacia (a máscara pula o fundo)
+        shapes_list = list(rasterio.features.shapes(
+            catch_mask,
+            mask=catch_mask.view(bool),
+            connectivity=4,
+            transform=transform
+        ))
+        
+        if not shapes_list:
+            raise ValueError("Nenhuma geometria foi criada")
+        
+        # 8. Filtra polígonos degenerados (predicado vetorizado do GEOS).
+        # A poligonização com conectividade 4 já gera anéis válidos, então
+        # o teste is_valid (caro) é dispensado
+        geoms = np.array(
+            [shape(geom) for geom, value in shapes_list if value == 1],
+            dtype=object
+        )
+        valid_shapes = geoms[shapely.area(geoms) > 0]
+        
+        if not valid_shapes.size:
+            raise ValueError("Nenhum polígono válido encontrado")
+        
+        if verbose:
+            self.logger.info(
+                f"  - {len(valid_shapes)} polígonos válidos de {len(shapes_list)} shapes"
+            )
+        
+        # 9. Combina polígonos: a união em cascata do GEOS agrupa as
+        # geometrias por STRtree, evitando comparar todos os pares
+        if len(valid_shapes) == 1:
+            return valid_shapes[0]
+        
+        return shapely.unary_union(valid_shapes)
+    
+    def _snap_to_stream(self, row: int, col: int, window: int) -> Tuple[int, int]:
+        """
+        Célula de maior acumulação na janela window x window centrada
+        em (row, col)
+        
+        Só a janela de self.acc é lida: com o cache mapeado em memória,
+        apenas essas páginas vêm do disco.
+        """
+        rows, cols = self.acc.shape
+        if not (0 <= row < rows and 0 <= col < cols):
+            raise ValueError(f"Exutório fora da grid: row={row}, col={col}, grid {rows}x{cols}")
+        
+        half = window // 2
+        r0, c0 = max(row - half, 0), max(col - half, 0)
+        sub = self.acc[r0:row + half + 1, c0:col + half + 1]
+        
+        r, c = np.unravel_index(np.argmax(sub), sub.shape)
+        
+        return r0 + int(r), c0 + int(c)
+    
+    def _save_outputs(
+        self,
+        gdf: gpd.GeoDataFrame,
+        output_path: Path,
+        name: str,
+        output_formats: Sequence[str] = ('gpkg',),
+        area_km2: Optional[float] = None
+    ):
+        """
+        Salva o resultado nos formatos pedidos ('gpkg', 'geojson', 'shp')
+        
+        Vários formatos são gravados em paralelo (o GDAL libera o GIL
+        durante a escrita). O Shapefile é omitido para bacias acima de
+        SHAPEFILE_MAX_AREA_KM2 (limite de 2 GB e nomes de campo truncados).
+        """
+        unknown = set(output_formats) - OUTPUT_DRIVERS.keys()
+        if unknown:
+            raise ValueError(f"Formato de saída desconhecido: {', '.join(sorted(unknown))}")
+        
+        output_path.mkdir(parents=True, exist_ok=True)
+        
+        formats = list(dict.fromkeys(output_formats))
+        if 'shp' in formats:
+            if area_km2 is None:
+                area_km2 = self.get_watershed_stats(gdf)['area_km2']
+            if area_km2 >= SHAPEFILE_MAX_AREA_KM2:
+                formats.remove('shp')
+                self.logger.info(f"Shapefile omitido: bacia de {area_km2:.0f} km²")
+        
+        if not formats:
+            return
+        
+        with ThreadPoolExecutor(max_workers=len(formats)) as executor:
+            futures = []
+            for fmt in formats:
+                label, driver = OUTPUT_DRIVERS[fmt]
+                path = output_path / f'{name}.{fmt}'
+                futures.append((label, path, executor.submit(gdf.to_file, path, driver=driver)))
+            
+            for label, path, future in futures:
                 try:
-                    os.remove(temp_file)
-                    self.logger.info("Arquivo temporário removido")
-                except:
-                    pass
+                    future.result()
+                    self.logger.info(f"✓ {label} salvo: {path}")
+                except Exception as e:
+                    self.logger.warning(f"Erro ao salvar {label}: {e}")
     
     def get_watershed_stats(self, watershed_gdf: gpd.GeoDataFrame) -> dict:
         """
         Calcula estatísticas da bacia
         
+        Área e perímetro são calculados em metros. Se o CRS for geográfico,
+        ambos vêm de uma única chamada geodésica por geometria sobre o
+        elipsoide WGS84 (sem reprojeção para CRS métrico).
+        
         Returns:
         --------
         dict
             Dicionário com estatísticas
         """
-        area_m2 = watershed_gdf.geometry.area.sum()
-        perimeter_m = watershed_gdf.geometry.length.sum()
+        geoms = np.asarray(watershed_gdf.geometry.values)
+        crs = watershed_gdf.crs
+        
+        if crs is not None and crs.is_geographic:
+            geographic = watershed_gdf.geometry
+            if crs.to_epsg() != 4326:
+                geographic = geographic.to_crs(epsg=4326)
+            
+            geod = pyproj.Geod(ellps='WGS84')
+            area_m2 = perimeter_m = 0.0
+            for geom in geographic.values:
+                area, perimeter = geod.geometry_area_perimeter(geom)
+                area_m2 += abs(area)
+                perimeter_m += perimeter
+        else:
+            # Chamadas vetorizadas do GEOS sobre o array de geometrias
+            area_m2 = float(shapely.area(geoms).sum())
+            perimeter_m = float(shapely.length(geoms).sum())
+        
+        bounds = shapely.total_bounds(geoms)
         
         stats = {
             'area_m2': area_m2,
@@ -380,7 +854,7 @@ class PySheksWrapper:
             'area_km2': area_m2 / 1_000_000,
             'perimeter_m': perimeter_m,
             'perimeter_km': perimeter_m / 1_000,
-            'bounds': watershed_gdf.total_bounds,
+            'bounds': bounds,
             'crs': watershed_gdf.crs
         }
         
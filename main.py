@@ -4,8 +4,9 @@ Ponto de entrada principal da aplicação
 """
 import sys
 from pathlib import Path
+from dotenv import load_dotenv
 from PyQt5.QtWidgets import QApplication
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import QT_VERSION_STR, Qt
 
 # Adiciona diretório raiz ao path para importar hydroai
 sys.path.insert(0, str(Path(__file__).parent))
@@ -17,12 +18,18 @@ def main():
     """
     Função principal - inicializa a aplicação HydroAI
     """
+    # Carrega variáveis de ambiente (.env da raiz do projeto) uma única vez,
+    # na inicialização; funciona com a aplicação iniciada de qualquer diretório
+    load_dotenv(Path(__file__).resolve().parent / '.env')
+    
     # Configura logging
     setup_logging()
     
     # Ativa High DPI scaling para melhor resolução em telas modernas
-    QApplication.setAttribute(Qt.AA_EnableHighDpiScaling, True)
-    QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps, True)
+    # (no Qt 6 já é sempre ativo e os atributos estão obsoletos)
+    if int(QT_VERSION_STR.split('.')[0]) < 6:
+        QApplication.setAttribute(Qt.AA_EnableHighDpiScaling, True)
+        QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps, True)
     
     # Cria aplicação Qt
     app = QApplication(sys.argv)
@@ -0,0 +1,45 @@
+"""
+Testes do cache local de DEMs (hydroai.watershed.dem_cache)
+"""
+import pytest
+
+from hydroai.watershed import dem_cache
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    path = tmp_path / 'cache'
+    monkeypatch.setattr(dem_cache, 'DEM_CACHE_DIR', path)
+    return path
+
+def test_miss_returns_none(tmp_path):
+    assert dem_cache.load_from_cache('usgs_srtm_01_01.tif', tmp_path / 'dem.tif') is None
+    assert not (tmp_path / 'dem.tif').exists()
+
+def test_store_then_hit(tmp_path, cache_dir):
+    source = tmp_path / 'download.tif'
+    source.write_bytes(b'dem' * 100)
+
+    dem_cache.store_in_cache(source, 'usgs_srtm_01_01.tif')
+    output = dem_cache.load_from_cache('usgs_srtm_01_01.tif', tmp_path / 'dem.tif')
+
+    assert output == tmp_path / 'dem.tif'
+    assert output.read_bytes() == source.read_bytes()
+    # Só o arquivo final fica no cache, sem temporários
+    assert [p.name for p in cache_dir.iterdir()] == ['usgs_srtm_01_01.tif']
+
+def test_store_replaces_entry(tmp_path):
+    source = tmp_path / 'download.tif'
+    source.write_bytes(b'old')
+    dem_cache.store_in_cache(source, 'key.tif')
+
+    source.write_bytes(b'new')
+    dem_cache.store_in_cache(source, 'key.tif')
+
+    output = dem_cache.load_from_cache('key.tif', tmp_path / 'dem.tif')
+    assert output.read_bytes() == b'new'
+
+def test_empty_entry_is_a_miss(tmp_path, cache_dir):
+    cache_dir.mkdir()
+    (cache_dir / 'key.tif').write_bytes(b'')
+
+    assert dem_cache.load_from_cache('key.tif', tmp_path / 'dem.tif') is None
@@ -0,0 +1,105 @@
+"""
+Testes do cache em disco de fdir/acc (PySheksWrapper._prepare_flow)
+"""
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("numba")
+pytest.importorskip("pysheds")
+rasterio = pytest.importorskip("rasterio")
+from rasterio.transform import from_origin
+
+from hydroai.watershed import pysheds_wrapper
+from hydroai.watershed.pysheds_wrapper import PySheksWrapper
+
+def write_dem(path, dem):
+    with rasterio.open(
+        path, 'w', driver='GTiff', height=dem.shape[0], width=dem.shape[1], count=1,
+        dtype='float32', crs='EPSG:4326', transform=from_origin(-50.0, -20.0, 0.001, 0.001)
+    ) as dst:
+        dst.write(dem.astype(np.float32), 1)
+
+@pytest.fixture
+def dem_path(tmp_path):
+    r, c = np.mgrid[0:16, 0:16]
+    path = tmp_path / "dem.tif"
+    write_dem(path, np.abs(c - 8) + 0.5 * (16 - r))
+    return path
+
+@pytest.fixture(autouse=True)
+def flow_cache(tmp_path, monkeypatch):
+    path = tmp_path / 'cache'
+    monkeypatch.setattr(pysheds_wrapper, 'DEM_CACHE_DIR', path)
+    return path / 'flow'
+
+def not_called(*args, **kwargs):
+    raise AssertionError("fluxo recalculado apesar do cache")
+
+def test_cache_hit(dem_path, flow_cache):
+    first = PySheksWrapper(verbose=False)
+    first.load_dem(dem_path)
+    first._prepare_flow()
+    assert len(list(flow_cache.glob('*.fdir.npy'))) == 1
+
+    second = PySheksWrapper(verbose=False)
+    second.load_dem(dem_path)
+    second.preprocess_dem = not_called
+    second._prepare_flow()
+
+    np.testing.assert_array_equal(second.fdir, first.fdir)
+    np.testing.assert_array_equal(second.acc, first.acc)
+
+def test_rewrite_same_size_invalidates(dem_path):
+    wrapper = PySheksWrapper(verbose=False)
+    wrapper.load_dem(dem_path)
+    key = wrapper._flow_cache_key('numba')
+
+    # Mesmo tamanho, conteúdo diferente (vale invertido) e mtime novo
+    st = os.stat(dem_path)
+    r, c = np.mgrid[0:16, 0:16]
+    write_dem(dem_path, np.abs(c - 8) + 0.5 * r)
+    os.utime(dem_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert os.stat(dem_path).st_size == st.st_size
+
+    wrapper.load_dem(dem_path)
+    assert wrapper._flow_cache_key('numba') != key
+
+def test_cache_disabled(dem_path, flow_cache):
+    wrapper = PySheksWrapper(verbose=False, flow_cache=False)
+    wrapper.load_dem(dem_path)
+    wrapper._prepare_flow()
+
+    assert wrapper.fdir is not None
+    assert not flow_cache.exists()
+
+def fake_entries(flow_cache, count, cells=100):
+    flow_cache.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        for suffix in ('fdir', 'acc'):
+            path = flow_cache / f"key{i}.{suffix}.npy"
+            np.save(path, np.zeros(cells, np.uint8))
+        # key0 é a mais antiga
+        os.utime(flow_cache / f"key{i}.fdir.npy", ns=(i * 10**9, i * 10**9))
+
+def remaining(flow_cache):
+    return sorted(p.name[:-len('.fdir.npy')] for p in flow_cache.glob('*.fdir.npy'))
+
+def test_evict_by_entries(flow_cache, monkeypatch):
+    monkeypatch.setattr(pysheds_wrapper, 'FLOW_CACHE_MAX_ENTRIES', 2)
+    fake_entries(flow_cache, 3)
+
+    PySheksWrapper(verbose=False)._evict_flow_cache(flow_cache)
+
+    assert remaining(flow_cache) == ['key1', 'key2']
+    assert not (flow_cache / 'key0.acc.npy').exists()
+
+def test_evict_by_bytes(flow_cache, monkeypatch):
+    fake_entries(flow_cache, 3)
+    entry_bytes = sum(p.stat().st_size for p in flow_cache.glob('key2.*'))
+    monkeypatch.setattr(pysheds_wrapper, 'FLOW_CACHE_MAX_BYTES', 2 * entry_bytes)
+
+    PySheksWrapper(verbose=False)._evict_flow_cache(flow_cache)
+
+    assert remaining(flow_cache) == ['key1', 'key2']
@@ -0,0 +1,27 @@
+"""
+Testes de hydroai.utils.formatters
+"""
+from datetime import datetime
+
+from hydroai.utils import formatters
+from hydroai.utils.formatters import format_date
+
+def test_format_date_string():
+    assert format_date('2025-11-14') == '14/11/2025'
+    assert format_date('2025-11-14T10:30:00', '%H:%M') == '10:30'
+
+def test_format_date_datetime():
+    assert format_date(datetime(2025, 11, 14)) == '14/11/2025'
+
+def test_format_date_invalid_string_is_returned():
+    assert format_date('não é data') == 'não é data'
+
+def test_format_date_is_cached():
+    formatters._format_iso.cache_clear()
+
+    format_date('2024-01-02')
+    format_date('2024-01-02')
+
+    info = formatters._format_iso.cache_info()
+    assert info.hits == 1
+    assert info.misses == 1
@@ -0,0 +1,87 @@
+"""
+Testes do ProjectManager: tamanho do projeto e cache de metadados
+"""
+import json
+
+import pytest
+
+from hydroai.core import project_manager
+from hydroai.core.project_manager import ProjectManager
+
+def test_project_size_missing_or_file(tmp_path):
+    pm = ProjectManager(tmp_path / 'projects')
+
+    # Diretório inexistente e caminho de arquivo retornam 0.0, como antes
+    assert pm.get_project_size(tmp_path / 'nao_existe') == 0.0
+
+    file_path = tmp_path / 'arquivo.txt'
+    file_path.write_bytes(b'x' * 10)
+    assert pm.get_project_size(file_path) == 0.0
+
+def test_project_size(tmp_path):
+    pm = ProjectManager(tmp_path / 'projects')
+    project_path = pm.create_project('Teste', lat=-29.4, lon=-56.7)
+
+    (project_path / 'results' / 'a.bin').write_bytes(b'x' * 1024 * 1024)
+
+    assert pm.get_project_size(project_path) >= 1.0
+
+@pytest.fixture
+def pm(tmp_path, monkeypatch):
+    # TTL longo: dentro do teste o cache é usado sem novo stat
+    monkeypatch.setattr(project_manager, 'METADATA_CACHE_TTL', 3600)
+    return ProjectManager(tmp_path / 'projects')
+
+def test_load_project_cache_hit(pm):
+    project_path = pm.create_project('Teste', lat=-29.4, lon=-56.7)
+    pm.load_project(project_path)
+
+    # Alteração externa dentro do TTL não é vista: veio do cache
+    metadata_file = project_path / 'project.json'
+    data = json.loads(metadata_file.read_bytes())
+    data['name'] = 'Externo'
+    metadata_file.write_text(json.dumps(data))
+
+    assert pm.load_project(project_path)['name'] == 'Teste'
+
+def test_load_project_returns_independent_copy(pm):
+    project_path = pm.create_project('Teste', lat=-29.4, lon=-56.7)
+
+    metadata = pm.load_project(project_path)
+    metadata['outlet']['lat'] = 0
+    metadata['name'] = 'Alterado'
+
+    again = pm.load_project(project_path)
+    assert again['outlet']['lat'] == -29.4
+    assert again['name'] == 'Teste'
+
+def test_update_project_invalidates_cache(pm):
+    project_path = pm.create_project('Teste', lat=-29.4, lon=-56.7)
+    pm.load_project(project_path)
+
+    pm.update_project(project_path, {'status': 'watershed_delineated'})
+
+    assert pm.load_project(project_path)['status'] == 'watershed_delineated'
+    # Nenhum temporário sobra ao lado do project.json
+    assert [p.name for p in project_path.glob('*.tmp')] == []
+
+def test_load_project_sees_external_change_after_ttl(pm, monkeypatch):
+    project_path = pm.create_project('Teste', lat=-29.4, lon=-56.7)
+    pm.load_project(project_path)
+
+    monkeypatch.setattr(project_manager, 'METADATA_CACHE_TTL', 0)
+    metadata_file = project_path / 'project.json'
+    data = json.loads(metadata_file.read_bytes())
+    data['name'] = 'Externo com outro tamanho'
+    metadata_file.write_text(json.dumps(data))
+
+    assert pm.load_project(project_path)['name'] == 'Externo com outro tamanho'
+
+def test_delete_project_drops_cache(pm):
+    project_path = pm.create_project('Teste', lat=-29.4, lon=-56.7)
+    pm.load_project(project_path)
+
+    pm.delete_project(project_path)
+
+    with pytest.raises(FileNotFoundError):
+        pm.load_project(project_path)
@@ -0,0 +1,88 @@
+"""
+Teste ponta a ponta da delimitação: fill -> fdir -> acumulação -> bacia
+sobre um DEM sintético pequeno
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip("numba")
+pytest.importorskip("pysheds")
+rasterio = pytest.importorskip("rasterio")
+from rasterio.transform import from_origin
+
+from hydroai.watershed import pysheds_wrapper
+from hydroai.watershed._catchment import catchment_mask
+from hydroai.watershed.pysheds_wrapper import PySheksWrapper
+
+ROWS, COLS = 20, 21
+# Exutório no talvegue, uma linha acima da borda sul
+OUTLET = (ROWS - 2, COLS // 2)
+RES = 0.001
+WEST, NORTH = -50.0, -20.0
+
+@pytest.fixture
+def dem_path(tmp_path):
+    # Vale em V descendo para o sul, com um poço no meio do talvegue
+    r, c = np.mgrid[0:ROWS, 0:COLS]
+    dem = (np.abs(c - COLS // 2) + 0.5 * (ROWS - r)).astype(np.float32)
+    dem[10, COLS // 2] -= 3
+
+    path = tmp_path / "dem.tif"
+    with rasterio.open(
+        path, 'w', driver='GTiff', height=ROWS, width=COLS, count=1,
+        dtype='float32', crs='EPSG:4326', transform=from_origin(WEST, NORTH, RES, RES)
+    ) as dst:
+        dst.write(dem, 1)
+
+    return path
+
+@pytest.fixture(autouse=True)
+def flow_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(pysheds_wrapper, 'DEM_CACHE_DIR', tmp_path / 'cache')
+
+def test_pipeline(dem_path):
+    wrapper = PySheksWrapper(verbose=False)
+    wrapper.load_dem(dem_path)
+
+    dem_conditioned = wrapper.preprocess_dem()
+    fdir = wrapper.calculate_flow_direction(dem_conditioned)
+    acc = wrapper.calculate_flow_accumulation()
+
+    assert fdir.dtype == np.uint8
+    assert acc.dtype == np.int32
+
+    catch = catchment_mask(fdir, *OUTLET)
+
+    # O poço foi preenchido: todo o talvegue drena para o exutório
+    assert catch[1:OUTLET[0] + 1, COLS // 2].all()
+    # Acumulação e D8 reverso contam as mesmas células
+    assert acc[OUTLET] == np.count_nonzero(catch)
+
+def test_delineate_watershed(dem_path, tmp_path):
+    wrapper = PySheksWrapper(verbose=False)
+    lon = WEST + (OUTLET[1] + 0.5) * RES
+    lat = NORTH - (OUTLET[0] + 0.5) * RES
+
+    gdf = wrapper.delineate_watershed(lat, lon, dem_path, output_path=tmp_path / 'out')
+
+    assert len(gdf) == 1
+    assert wrapper.get_watershed_stats(gdf)['area_km2'] > 0
+    assert (tmp_path / 'out' / 'watershed.gpkg').exists()
+
+@pytest.mark.parametrize('row, col', [(-1, 5), (5, -1), (ROWS, 5), (5, COLS)])
+def test_outlet_outside_grid(dem_path, row, col):
+    fdir = np.zeros((ROWS, COLS), np.uint8)
+    with pytest.raises(ValueError):
+        catchment_mask(fdir, row, col)
+
+    wrapper = PySheksWrapper(verbose=False)
+    wrapper.load_dem(dem_path)
+    wrapper._prepare_flow()
+    with pytest.raises(ValueError):
+        wrapper._snap_to_stream(row, col, 5)
+
+def test_delineate_outlet_west_of_dem(dem_path):
+    # 0.7 célula a oeste do DEM: nearest_cell dá col=-1
+    wrapper = PySheksWrapper(verbose=False)
+    with pytest.raises(ValueError):
+        wrapper.delineate_watershed(NORTH - 10.5 * RES, WEST - 0.7 * RES, dem_path)